@@ -1,14 +1,18 @@
+import logging
 import os
 from flask import Flask, render_template, redirect, url_for, flash, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, current_user
 from flask_migrate import Migrate
-from werkzeug.security import generate_password_hash
+from sqlalchemy import DDL, event
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
 
+# Logging (nível configurável por LOG_LEVEL; o Render coleta a saída padrão)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+
 # Criar aplicação Flask
 app = Flask(__name__)
 
@@ -27,6 +31,21 @@ if app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgres://"):
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace("postgres://",
                                                                                           "postgresql://", 1)
 
+# Pool de conexões do PostgreSQL (o Render encerra conexões ociosas)
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgresql://"):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_pre_ping': True,  # Descarta conexões mortas antes de usar
+        'pool_recycle': 300,  # Renova conexões a cada 5 minutos
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_use_lifo': True,  # Reutiliza a conexão mais recente (mantém o pool enxuto)
+        # executemany em lote: INSERTs viram um INSERT ... VALUES com várias linhas
+        # (padrão do SQLAlchemy 2) e UPDATEs/DELETEs em lote usam execute_batch
+        'executemany_mode': 'values_plus_batch',
+        'insertmanyvalues_page_size': 1000,
+        'executemany_batch_page_size': 500
+    }
+
 # Outras configurações
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'uploads')
@@ -39,6 +58,10 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB máximo para upload
 # Banco de dados
 db = SQLAlchemy(app)
 
+# Busca por trecho de texto (índices trigram dos modelos): extensão só no PostgreSQL
+event.listen(db.metadata, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
 # Migrações do banco
 migrate = Migrate(app, db)
 
@@ -56,28 +79,35 @@ login_manager.login_message_category = 'info'
 from models.user import User, QuizResult
 from models.quiz import Quiz
 from models.question import Question
+from utils.helpers import hash_password
 
 
 # Função necessária para o Flask-Login carregar usuários
+# (o Flask-Login já guarda o resultado em g durante a requisição)
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return db.session.get(User, int(user_id))
 
 
 # ================================
 # IMPORTAR E REGISTRAR ROTAS
 # ================================
 
-from routes.auth import auth
-from routes.dashboard import dashboard
-from routes.quiz import quiz
-from routes.user import user
+def register_blueprints(app):
+    """Importa e registra os blueprints (grupos de rotas)"""
+    # Imports locais: os módulos de rotas só são carregados aqui, uma única vez
+    from routes.auth import auth
+    from routes.dashboard import dashboard
+    from routes.quiz import quiz
+    from routes.user import user
+
+    app.register_blueprint(auth, url_prefix='/auth')
+    app.register_blueprint(dashboard, url_prefix='/dashboard')
+    app.register_blueprint(quiz, url_prefix='/quiz')
+    app.register_blueprint(user, url_prefix='/user')
 
-# Registrar blueprints (grupos de rotas)
-app.register_blueprint(auth, url_prefix='/auth')
-app.register_blueprint(dashboard, url_prefix='/dashboard')
-app.register_blueprint(quiz, url_prefix='/quiz')
-app.register_blueprint(user, url_prefix='/user')
+
+register_blueprints(app)
 
 
 # ================================
@@ -99,14 +129,12 @@ def index():
 @app.context_processor
 def inject_global_vars():
     """Disponibiliza variáveis em todos os templates"""
-    from models.user import User
-    
+    # current_user já é injetado pelo context processor do Flask-Login
     pending_count = 0
     if current_user.is_authenticated and (current_user.user_type in ['admin', 'moderator']):
-        pending_count = User.query.filter_by(is_approved=False).count()
+        pending_count = User.pending_count()
     
     return {
-        'current_user': current_user,
         'User': User,
         'app_name': 'Brainchild',
         'pending_users_count': pending_count
@@ -124,7 +152,7 @@ def create_admin_user():
         admin_user = User(
             username='admin',
             email='admin@brainchild.com',
-            password_hash=generate_password_hash('admin123'),
+            password_hash=hash_password('admin123'),
             first_name='Administrador',
             last_name='Brainchild',
             phone='',
@@ -133,33 +161,45 @@ def create_admin_user():
         )
         db.session.add(admin_user)
         db.session.commit()
-        print("✅ Usuário administrador criado!")
-        print("📧 Email: admin@brainchild.com")
-        print("🔑 Senha: admin123")
-        print("⚠️  IMPORTANTE: Altere esta senha após o primeiro login!")
+        app.logger.info("✅ Usuário administrador criado!")
+        app.logger.info("📧 Email: %s", admin_user.email)
+        app.logger.info("🔑 Senha: admin123")
+        app.logger.warning("⚠️  IMPORTANTE: Altere esta senha após o primeiro login!")
 
 
-# ================================
-# INICIALIZAÇÃO - COMPATÍVEL COM FLASK 3.0+
-# ================================
-
-with app.app_context():
-    """Executado quando o app é inicializado"""
-    # Criar todas as tabelas do banco
+def init_database():
+    """Cria tabelas, usuário admin padrão e diretórios necessários"""
+    # Criar todas as tabelas do banco (contadores desnormalizados: preenchidos pela
+    # migração que cria as colunas e recalculados só pelo flask refresh-stats)
     db.create_all()
-    
+
     # Criar usuário admin padrão
     create_admin_user()
-    
-    print("🚀 Brainchild inicializado com sucesso!")
+
+    # Criar diretório de uploads se não existir
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 
 # ================================
-# PREPARAR DIRETÓRIOS NECESSÁRIOS
+# COMANDOS DE LINHA DE COMANDO
 # ================================
 
-# Criar diretório de uploads se não existir
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+@app.cli.command('init-db')
+def init_db_command():
+    """Inicializa o banco de dados (executar uma vez por deploy: flask init-db)"""
+    init_database()
+    app.logger.info("🚀 Brainchild inicializado com sucesso!")
+
+
+@app.cli.command('refresh-stats')
+def refresh_stats_command():
+    """Recalcula contadores e médias dos quizzes e usuários (agendar periodicamente: flask refresh-stats)"""
+    Quiz.refresh_question_counts()
+    Quiz.refresh_attempt_stats()
+    User.refresh_result_totals()
+    db.session.commit()
+    app.logger.info("📊 Estatísticas dos quizzes atualizadas")
+
 
 # ================================
 # EXECUTAR APLICAÇÃO
@@ -169,9 +209,13 @@ if __name__ == '__main__':
     # Determinar se está em desenvolvimento ou produção
     debug_mode = os.environ.get('FLASK_ENV') == 'development'
 
-    print("🧠 Iniciando Brainchild...")
-    print(f"🔧 Modo: {'Desenvolvimento' if debug_mode else 'Produção'}")
-    print(f"🗄️  Banco: {app.config['SQLALCHEMY_DATABASE_URI']}")
+    app.logger.info("🧠 Iniciando Brainchild...")
+    app.logger.info("🔧 Modo: %s", 'Desenvolvimento' if debug_mode else 'Produção')
+    app.logger.info("🗄️  Banco: %s", app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # Em execução local, garantir banco pronto sem precisar do flask init-db
+    with app.app_context():
+        init_database()
 
     # Rodar aplicação
     app.run(
@@ -0,0 +1,160 @@
+"""contadores desnormalizados e índices de consulta
+
+Colunas de contadores em quizzes (question_count, total_attempts, average_score)
+e users (totais de resultados), difficulty_score em questions e os índices dos
+modelos. Bancos novos não têm tabelas quando o upgrade roda (o flask init-db as
+cria já completas): nesse caso a revisão não faz nada. Em bancos existentes só
+é criado o que ainda falta, e os contadores recém-criados são preenchidos uma
+única vez a partir de questions e quiz_results (depois, só flask refresh-stats
+os recalcula por inteiro).
+
+Revision ID: 5c1e8a7d2b90
+Revises:
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e8a7d2b90'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('questions', 'quizzes', 'users', 'quiz_results')
+
+# Mesmos filtros dos índices parciais em models/quiz.py
+LISTABLE_CONDITION = 'is_active AND NOT is_archived AND NOT is_deleted AND question_count > 0'
+MANAGE_ACTIVE_CONDITION = 'is_active AND NOT is_archived AND NOT is_deleted'
+
+COLUMNS = {
+    'quizzes': [
+        sa.Column('question_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('average_score', sa.Float(), nullable=False, server_default='0'),
+    ],
+    'users': [
+        sa.Column('quizzes_played', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('score_total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('questions_answered', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('best_percentage', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('time_spent_total', sa.Integer(), nullable=False, server_default='0'),
+    ],
+    'questions': [
+        sa.Column('difficulty_score', sa.SmallInteger(), nullable=True),
+    ],
+}
+
+# Preenchimento inicial dos contadores (SQL puro: não passa pelo onupdate de updated_at)
+BACKFILL = {
+    'quizzes': """
+        UPDATE quizzes SET
+            question_count = (SELECT COUNT(*) FROM questions
+                              WHERE questions.quiz_id = quizzes.id),
+            total_attempts = (SELECT COUNT(*) FROM quiz_results
+                              WHERE quiz_results.quiz_id = quizzes.id),
+            average_score = COALESCE((SELECT AVG(score * 100.0 / NULLIF(total_questions, 0))
+                                      FROM quiz_results
+                                      WHERE quiz_results.quiz_id = quizzes.id), 0)
+    """,
+    'users': """
+        UPDATE users SET
+            quizzes_played = (SELECT COUNT(*) FROM quiz_results
+                              WHERE quiz_results.user_id = users.id),
+            score_total = COALESCE((SELECT SUM(score) FROM quiz_results
+                                    WHERE quiz_results.user_id = users.id), 0),
+            questions_answered = COALESCE((SELECT SUM(total_questions) FROM quiz_results
+                                           WHERE quiz_results.user_id = users.id), 0),
+            best_percentage = COALESCE((SELECT MAX(score * 100.0 / NULLIF(total_questions, 0))
+                                        FROM quiz_results
+                                        WHERE quiz_results.user_id = users.id), 0),
+            time_spent_total = COALESCE((SELECT SUM(time_spent) FROM quiz_results
+                                         WHERE quiz_results.user_id = users.id), 0)
+    """,
+}
+
+# (nome, tabela, colunas, opções de op.create_index)
+INDEXES = [
+    ('ix_questions_quiz_order', 'questions', ['quiz_id', 'order_index'], {}),
+    ('ix_questions_difficulty_score', 'questions', ['difficulty_score'], {}),
+    ('ix_quizzes_listable', 'quizzes', ['created_at'],
+     {'postgresql_where': sa.text(LISTABLE_CONDITION), 'sqlite_where': sa.text(LISTABLE_CONDITION)}),
+    ('ix_quizzes_listable_attempts', 'quizzes', ['total_attempts'],
+     {'postgresql_where': sa.text(LISTABLE_CONDITION), 'sqlite_where': sa.text(LISTABLE_CONDITION)}),
+    ('ix_quizzes_creator_created', 'quizzes', ['created_by', 'created_at'], {}),
+    ('ix_quizzes_creator_active_created', 'quizzes', ['created_by', 'created_at'],
+     {'postgresql_where': sa.text(MANAGE_ACTIVE_CONDITION),
+      'sqlite_where': sa.text(MANAGE_ACTIVE_CONDITION)}),
+    ('ix_quizzes_creator_attempts', 'quizzes', ['created_by', 'total_attempts'], {}),
+    ('ix_users_pending', 'users', ['created_at'],
+     {'postgresql_where': sa.text('NOT is_approved'), 'sqlite_where': sa.text('NOT is_approved')}),
+    ('ix_users_created', 'users', ['created_at'], {}),
+    ('ix_quiz_results_quiz_completed', 'quiz_results', ['quiz_id', 'completed_at'], {}),
+    ('ix_quiz_results_user_completed', 'quiz_results', ['user_id', 'completed_at'], {}),
+    ('ix_quiz_results_completed', 'quiz_results', ['completed_at'], {}),
+]
+
+# Busca por trecho de texto: GIN trigram, só no PostgreSQL
+TRGM_INDEXES = [
+    ('ix_quizzes_title_trgm', 'quizzes', ['title']),
+    ('ix_users_search_trgm', 'users', ['username', 'first_name', 'last_name', 'email']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    # Banco novo: as tabelas (já completas) vêm do db.create_all() do flask init-db
+    if not set(TABLES) <= tables:
+        return
+
+    for table, columns in COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        missing = [column for column in columns if column.name not in existing]
+        for column in missing:
+            op.add_column(table, column)
+
+        # Colunas novas começam em 0: calcular os totais uma vez, aqui
+        if missing and table in BACKFILL:
+            op.execute(BACKFILL[table])
+
+    existing_indexes = _index_names(inspector)
+    for name, table, columns, options in INDEXES:
+        if name not in existing_indexes:
+            op.create_index(name, table, columns, **options)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, columns in TRGM_INDEXES:
+            if name not in existing_indexes:
+                op.create_index(name, table, columns, postgresql_using='gin',
+                                postgresql_ops={column: 'gin_trgm_ops' for column in columns})
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not set(TABLES) <= set(inspector.get_table_names()):
+        return
+
+    existing_indexes = _index_names(inspector)
+    for name, table, *_ in reversed(INDEXES + [(*index, {}) for index in TRGM_INDEXES]):
+        if name in existing_indexes:
+            op.drop_index(name, table_name=table)
+
+    for table, columns in COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                if column.name in existing:
+                    batch_op.drop_column(column.name)
+
+
+def _index_names(inspector):
+    """Nomes dos índices já existentes nas tabelas da revisão"""
+    return {index['name']
+            for table in TABLES
+            for index in inspector.get_indexes(table)}
@@ -0,0 +1,23 @@
+"""
+Opções de carregamento - Brainchild
+===================================
+
+Presets de loader options para consultas de listagem:
+- strict: carrega só o que foi declarado e, em modo debug,
+  transforma lazy loads acidentais (N+1) em erro
+"""
+
+from flask import current_app
+from sqlalchemy.orm import raiseload
+
+
+def strict(*options):
+    """
+    Retorna as opções informadas + raiseload('*') em modo debug
+
+    Em produção um relacionamento esquecido continua funcionando (lazy load);
+    em desenvolvimento ele gera erro na hora, apontando o N+1.
+    """
+    if current_app.debug:
+        return [*options, raiseload('*')]
+    return list(options)
@@ -10,17 +10,30 @@ Define a estrutura das questões dos quizzes com:
 """
 
 from datetime import datetime
+from functools import cached_property
+from threading import Lock
+from cachetools import TTLCache, cached
 from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import event, insert, update, case, exists, select, func
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session, validates, aliased, object_session
 
-# Importação segura do SQLAlchemy
-try:
-    from app import db
-except ImportError:
-    try:
-        from flask_sqlalchemy import SQLAlchemy
-        db = SQLAlchemy()
-    except ImportError:
-        db = None
+# Usar a mesma instância db do app.py (um único registro de modelos)
+from app import db
+
+# Linhas de jogo por quiz (Question.cached_play_rows), por processo: tuplas de
+# linhas imutáveis, nunca objetos ligados a uma sessão. Alterar questões limpa o
+# quiz quando a transação é confirmada (ver _forget_stale_play_rows)
+_play_rows_cache = TTLCache(maxsize=256, ttl=60)
+_play_rows_lock = Lock()
+_STALE_PLAY_ROWS = 'stale_play_rows'
+
+
+def _mark_play_rows_stale(session, quiz_id):
+    """Marca o quiz para sair do cache de linhas de jogo no commit da sessão"""
+    if session is not None:
+        session.info.setdefault(_STALE_PLAY_ROWS, set()).add(quiz_id)
 
 
 class Question(db.Model):
@@ -29,6 +42,10 @@ class Question(db.Model):
     """
 
     __tablename__ = 'questions'
+    __table_args__ = (
+        # Listagem e reordenação sempre filtram por quiz e ordenam por posição
+        db.Index('ix_questions_quiz_order', 'quiz_id', 'order_index'),
+    )
 
     # Campos da tabela
     id = db.Column(db.Integer, primary_key=True)
@@ -44,11 +61,17 @@ class Question(db.Model):
     # Imagem da questão (opcional)
     image_filename = db.Column(db.String(255), nullable=True)
 
+    # Dificuldade estimada, recalculada a cada INSERT/UPDATE (ver _set_difficulty_score)
+    difficulty_score = db.Column(db.SmallInteger, nullable=True, index=True)
+
     # Controle de ordem e timestamps
     order_index = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Relacionamentos
+    quiz = db.relationship('Quiz', back_populates='questions')
+
     def __init__(self, quiz_id, question_text, correct_answer, option_a=None, option_b=None, option_c=None,
                  image_filename=None, order_index=0):
         self.quiz_id = quiz_id
@@ -60,42 +83,38 @@ class Question(db.Model):
         self.image_filename = image_filename
         self.order_index = order_index
 
-    def get_all_options(self):
-        """Retorna todas as opções de resposta (incluindo a correta)"""
-        options = [self.correct_answer]
+    @validates('question_text', 'correct_answer', 'option_a', 'option_b', 'option_c')
+    def _validate_answers(self, key, value):
+        """Descarta valores derivados em cache quando o texto ou uma resposta muda"""
+        _clear_cached_attributes(self)
+        return value
+
+    @cached_property
+    def _correct_answer_norm(self):
+        """Resposta correta normalizada, calculada uma única vez por instância"""
+        return (self.correct_answer or '').strip().casefold()
 
-        if self.option_a and self.option_a.strip():
-            options.append(self.option_a)
-        if self.option_b and self.option_b.strip():
-            options.append(self.option_b)
-        if self.option_c and self.option_c.strip():
-            options.append(self.option_c)
+    @cached_property
+    def _incorrect_options(self):
+        """Alternativas incorretas preenchidas, filtradas em uma única passada"""
+        return tuple(option for option in (self.option_a, self.option_b, self.option_c)
+                     if option and option.strip())
 
-        return options
+    def get_all_options(self):
+        """Retorna todas as opções de resposta (incluindo a correta)"""
+        return [self.correct_answer, *self._incorrect_options]
 
     def get_incorrect_options(self):
         """Retorna apenas as opções incorretas"""
-        options = []
-
-        if self.option_a and self.option_a.strip():
-            options.append(self.option_a)
-        if self.option_b and self.option_b.strip():
-            options.append(self.option_b)
-        if self.option_c and self.option_c.strip():
-            options.append(self.option_c)
-
-        return options
+        return list(self._incorrect_options)
 
     def is_answer_correct(self, answer):
         """Verifica se a resposta fornecida está correta"""
         if not answer:
             return False
 
-        # Normalizar strings para comparação (remover espaços e converter para minúsculo)
-        correct = self.correct_answer.strip().lower()
-        provided = answer.strip().lower()
-
-        return correct == provided
+        # Normalizar resposta para comparação (remover espaços e ignorar maiúsculas)
+        return answer.strip().casefold() == self._correct_answer_norm
 
     def validate_answer_by_letter(self, letter, alternatives_list):
         """
@@ -105,39 +124,34 @@ class Question(db.Model):
         if not letter or not alternatives_list:
             return False
 
-        # Encontrar a alternativa correspondente à letra
-        for alternative in alternatives_list:
-            if alternative['letter'].upper() == letter.upper():
-                return alternative['is_correct']
+        # Encontrar a alternativa correspondente à letra (texto, correta, letra)
+        for _text, is_correct, alternative_letter in alternatives_list:
+            if alternative_letter.upper() == letter.upper():
+                return is_correct
 
         return False
 
     @property
     def options_count(self):
         """Retorna o número de opções disponíveis (incluindo resposta correta)"""
-        count = 1  # Resposta correta sempre existe
-
-        if self.option_a and self.option_a.strip():
-            count += 1
-        if self.option_b and self.option_b.strip():
-            count += 1
-        if self.option_c and self.option_c.strip():
-            count += 1
-
-        return count
+        return 1 + len(self._incorrect_options)
 
     def has_image(self):
         """Verifica se a questão tem imagem"""
-        return self.image_filename is not None and self.image_filename.strip() != ''
+        filename = self.image_filename
+        return bool(filename) and not filename.isspace()
 
-    def get_formatted_question(self):
-        """Retorna a questão formatada com quebras de linha convertidas para HTML"""
+    @cached_property
+    def formatted_question(self):
+        """Questão em HTML seguro (texto escapado, quebras de linha como <br>)"""
         if not self.question_text:
-            return ""
+            return Markup('')
 
-        # Converter quebras de linha para HTML
-        formatted = self.question_text.replace('\n', '<br>')
-        return formatted
+        return Markup('<br>').join(escape(line) for line in self.question_text.splitlines())
+
+    def get_formatted_question(self):
+        """Retorna a questão formatada com quebras de linha convertidas para HTML"""
+        return self.formatted_question
 
     def get_question_preview(self, max_length=100):
         """Retorna preview da questão para listagens"""
@@ -151,16 +165,36 @@ class Question(db.Model):
         # Truncar e adicionar reticências
         return text[:max_length].rsplit(' ', 1)[0] + '...'
 
+    @hybrid_property
+    def preview(self):
+        """Primeiros PREVIEW_LENGTH caracteres da questão (com '...' se cortada)"""
+        text = self.question_text or ''
+        if len(text) > PREVIEW_LENGTH:
+            return text[:PREVIEW_LENGTH] + '...'
+        return text
+
+    @preview.expression
+    def preview(cls):
+        """Mesmo corte feito no banco: só o trecho inicial do TEXT trafega"""
+        return case(
+            (func.length(cls.question_text) > PREVIEW_LENGTH,
+             func.substr(cls.question_text, 1, PREVIEW_LENGTH, type_=db.Text) + '...'),
+            else_=cls.question_text
+        )
+
     def validate_options(self):
         """Valida se a questão tem pelo menos 2 opções (1 correta + 1 incorreta)"""
         incorrect_count = len(self.get_incorrect_options())
         return incorrect_count >= 1  # Mínimo 1 alternativa incorreta + resposta correta
 
-    def get_difficulty_estimate(self):
-        """Estima dificuldade baseada no comprimento do texto e número de opções"""
-        text_length = len(self.question_text) if self.question_text else 0
-        options_count = self.options_count
-        has_img = self.has_image()
+    def compute_difficulty_score(self):
+        """Calcula a pontuação de dificuldade (0 a 5) pelo texto, opções e imagem"""
+        return self.difficulty_from(self.question_text, self.options_count, self.has_image())
+
+    @staticmethod
+    def difficulty_from(question_text, options_count, has_img):
+        """Pontuação de dificuldade a partir dos valores já extraídos (sem instância)"""
+        text_length = len(question_text) if question_text else 0
 
         # Cálculo simples de dificuldade
         difficulty_score = 0
@@ -181,23 +215,54 @@ class Question(db.Model):
         if has_img:
             difficulty_score += 1
 
-        # Classificar dificuldade
-        if difficulty_score >= 4:
-            return 'Difícil'
-        elif difficulty_score >= 2:
-            return 'Médio'
-        else:
-            return 'Fácil'
+        return difficulty_score
+
+    def get_difficulty_estimate(self):
+        """Retorna a dificuldade estimada a partir da pontuação gravada no banco"""
+        score = self.difficulty_score
+        if score is None:
+            # Linhas anteriores à coluna (ou ainda não gravadas)
+            score = self.compute_difficulty_score()
+        return DIFFICULTY_LABELS.get(score, 'Difícil')
 
     def get_difficulty_color(self):
         """Retorna cor da dificuldade"""
-        difficulty = self.get_difficulty_estimate()
-        colors = {
-            'Fácil': 'success',
-            'Médio': 'warning',
-            'Difícil': 'danger'
-        }
-        return colors.get(difficulty, 'secondary')
+        return DIFFICULTY_COLORS.get(self.get_difficulty_estimate(), 'secondary')
+
+    @classmethod
+    def insert_many(cls, quiz, rows):
+        """
+        Insere as questões de um quiz num único INSERT em lote (executemany), sem
+        um flush por questão. rows são dicionários com os argumentos de Question().
+        O INSERT em lote não dispara os eventos do mapper: a dificuldade é calculada
+        aqui e o contador do quiz é ajustado uma única vez, direto no banco
+        """
+        if not rows:
+            return 0
+
+        values = []
+        for row in rows:
+            options_count = 1 + sum(1 for key in ('option_a', 'option_b', 'option_c')
+                                    if row.get(key) and row[key].strip())
+            image = row.get('image_filename')
+            difficulty = cls.difficulty_from(row.get('question_text'), options_count,
+                                             bool(image) and not image.isspace())
+            values.append(dict(row, quiz_id=quiz.id, difficulty_score=difficulty))
+
+        db.session.execute(insert(cls), values)
+
+        # Incremento atômico (UPDATE ... SET question_count = question_count + n);
+        # o valor em memória é recarregado do banco no próximo acesso
+        quizzes = db.metadata.tables['quizzes']
+        db.session.execute(
+            update(quizzes)
+            .where(quizzes.c.id == quiz.id)
+            .values(question_count=quizzes.c.question_count + len(values))
+        )
+        db.session.expire(quiz, ['question_count'])
+
+        _mark_play_rows_stale(db.session, quiz.id)
+        return len(values)
 
     def duplicate_to_quiz(self, target_quiz_id):
         """Duplica questão para outro quiz"""
@@ -210,62 +275,124 @@ class Question(db.Model):
                 option_b=self.option_b,
                 option_c=self.option_c,
                 image_filename=self.image_filename,
-                order_index=0
+                order_index=Question.next_order_index(target_quiz_id)
             )
 
-            if db:
-                db.session.add(new_question)
+            db.session.add(new_question)
             return new_question
-        except Exception as e:
-            print(f"Erro ao duplicar questão: {e}")
+        except Exception:
+            current_app.logger.exception("Erro ao duplicar questão")
             return None
 
-    def move_up(self):
-        """Move questão para cima na ordem"""
-        try:
-            if self.order_index > 0:
-                # Encontrar questão acima
-                question_above = Question.query.filter_by(
-                    quiz_id=self.quiz_id,
-                    order_index=self.order_index - 1
-                ).first()
-
-                if question_above and db:
-                    # Trocar posições
-                    question_above.order_index = self.order_index
-                    self.order_index = self.order_index - 1
-                    db.session.commit()
-                    return True
+    def _swap_order_with(self, target_index):
+        """
+        Troca a posição com a questão que está em target_index.
+        Um único UPDATE com CASE troca as duas linhas; a condição EXISTS garante
+        que nada muda quando não há questão na posição de destino.
+        """
+        current_index = self.order_index
+        neighbor = aliased(Question)
+
+        result = db.session.execute(
+            update(Question)
+            .where(
+                Question.quiz_id == self.quiz_id,
+                Question.order_index.in_([current_index, target_index]),
+                exists().where(neighbor.quiz_id == self.quiz_id,
+                               neighbor.order_index == target_index)
+            )
+            .values(order_index=case(
+                (Question.order_index == current_index, target_index),
+                else_=current_index
+            ))
+            .execution_options(synchronize_session='fetch')
+        )
+        # UPDATE em lote não dispara os eventos do mapper
+        _mark_play_rows_stale(db.session, self.quiz_id)
+        return result.rowcount == 2
 
-            return False
-        except Exception as e:
-            if db:
-                db.session.rollback()
-            print(f"Erro ao mover questão: {e}")
-            return False
+    def move_up(self):
+        """Move questão para cima na ordem (o commit fica a cargo de quem chama)"""
+        if self.order_index > 0:
+            return self._swap_order_with(self.order_index - 1)
+        return False
 
     def move_down(self):
-        """Move questão para baixo na ordem"""
-        try:
-            # Encontrar questão abaixo
-            question_below = Question.query.filter_by(
-                quiz_id=self.quiz_id,
-                order_index=self.order_index + 1
-            ).first()
-
-            if question_below and db:
-                # Trocar posições
-                question_below.order_index = self.order_index
-                self.order_index = self.order_index + 1
-                db.session.commit()
-                return True
+        """Move questão para baixo na ordem (o commit fica a cargo de quem chama)"""
+        return self._swap_order_with(self.order_index + 1)
 
-            return False
-        except Exception as e:
-            if db:
-                db.session.rollback()
-            print(f"Erro ao mover questão: {e}")
-            return False
+    @classmethod
+    def next_order_index(cls, quiz_id):
+        """
+        Expressão SQL da próxima posição livre no quiz.
+        Atribuída a order_index, é calculada dentro do próprio INSERT
+        (sem um SELECT MAX separado antes da inserção).
+        """
+        return (select(func.coalesce(func.max(cls.order_index) + 1, 0))
+                .where(cls.quiz_id == quiz_id)
+                .scalar_subquery())
+
+    @classmethod
+    def update_order_in_quiz(cls, quiz_id):
+        """
+        Renumera as questões do quiz (0, 1, 2, ...) sem buracos na ordem.
+        Lê apenas id/ordem e grava somente as linhas alteradas em lote.
+        """
+        rows = (db.session.query(cls.id, cls.order_index)
+                .filter(cls.quiz_id == quiz_id)
+                .order_by(cls.order_index, cls.id)
+                .all())
+
+        # updated_at é preenchido pelo onupdate da coluna
+        mappings = [
+            {'id': question_id, 'order_index': index}
+            for index, (question_id, order_index) in enumerate(rows)
+            if order_index != index
+        ]
+
+        if mappings:
+            db.session.bulk_update_mappings(cls, mappings)
+            _mark_play_rows_stale(db.session, quiz_id)
+        return len(mappings)
+
+    @classmethod
+    def list_for_quiz(cls, quiz_id, preview_only=False):
+        """
+        Lista as questões do quiz como dicionários para respostas JSON.
+        Projeta apenas as colunas necessárias (sem instanciar objetos Question).
+        Com preview_only, o texto vem truncado pelo próprio banco.
+        """
+        text_column = cls.preview.label('preview') if preview_only else cls.question_text
+        stmt = (select(cls.id, cls.order_index, text_column, cls.correct_answer,
+                       cls.option_a, cls.option_b, cls.option_c,
+                       cls.image_filename, cls.difficulty_score)
+                .where(cls.quiz_id == quiz_id)
+                .order_by(cls.order_index, cls.id))
+
+        return [dict(row) for row in db.session.execute(stmt).mappings()]
+
+    @classmethod
+    def play_rows(cls, quiz_ids):
+        """
+        Colunas usadas no jogo para as questões de vários quizzes, em ordem
+        (quiz_id, order_index). Retorna linhas simples, sem hidratar objetos Question.
+        """
+        stmt = (select(cls.quiz_id, cls.id, cls.question_text, cls.image_filename,
+                       cls.correct_answer, cls.option_a, cls.option_b, cls.option_c)
+                .where(cls.quiz_id.in_(quiz_ids))
+                .order_by(cls.quiz_id, cls.order_index, cls.id))
+
+        return db.session.execute(stmt).all()
+
+    @classmethod
+    @cached(_play_rows_cache, key=lambda cls, quiz_id: quiz_id, lock=_play_rows_lock)
+    def cached_play_rows(cls, quiz_id):
+        """
+        play_rows de um único quiz, em cache por 60 s: o SELECT e as linhas são
+        os mesmos em toda jogada; só o embaralhamento muda por tentativa.
+        Retorna uma tupla (quem for embaralhar deve copiar para uma lista)
+        """
+        return tuple(cls.play_rows([quiz_id]))
 
     def get_statistics_from_results(self):
         """Retorna estatísticas da questão baseadas nos resultados dos jogos"""
@@ -283,3 +410,66 @@ class Question(db.Model):
     def __repr__(self):
         preview = self.get_question_preview(50)
         return f'<Question {self.id}: {preview}>'
+
+
+# Tamanho do trecho usado em listagens (Question.preview)
+PREVIEW_LENGTH = 100
+
+# Classificação da pontuação de dificuldade (0-1 fácil, 2-3 médio, 4+ difícil)
+DIFFICULTY_LABELS = {0: 'Fácil', 1: 'Fácil', 2: 'Médio', 3: 'Médio', 4: 'Difícil', 5: 'Difícil'}
+DIFFICULTY_COLORS = {
+    'Fácil': 'success',
+    'Médio': 'warning',
+    'Difícil': 'danger'
+}
+
+# Valores derivados guardados no __dict__ da instância via cached_property
+_CACHED_ATTRIBUTES = ('_correct_answer_norm', '_incorrect_options', 'formatted_question')
+
+
+def _clear_cached_attributes(target, *args):
+    """Remove valores derivados em cache da questão"""
+    # O evento de expire pode chegar sem instância (objeto já coletado no commit)
+    if target is None:
+        return
+    for name in _CACHED_ATTRIBUTES:
+        target.__dict__.pop(name, None)
+
+
+# Recarregar a questão do banco invalida os valores derivados
+event.listen(Question, 'refresh', _clear_cached_attributes)
+event.listen(Question, 'expire', _clear_cached_attributes)
+
+
+@event.listens_for(Question, 'before_insert')
+@event.listens_for(Question, 'before_update')
+def _set_difficulty_score(mapper, connection, target):
+    """Grava a dificuldade junto com a questão (a leitura vira um simples acesso à coluna)"""
+    target.difficulty_score = target.compute_difficulty_score()
+
+
+@event.listens_for(Question, 'after_insert')
+@event.listens_for(Question, 'after_update')
+@event.listens_for(Question, 'after_delete')
+def _clear_play_rows(mapper, connection, target):
+    """Questão alterada: as linhas de jogo do quiz saem do cache no commit"""
+    _mark_play_rows_stale(object_session(target), target.quiz_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_stale_play_rows(session):
+    """
+    Só depois do commit: limpar antes deixaria outra requisição recolocar no
+    cache as linhas antigas (ainda confirmadas) entre o flush e o commit
+    """
+    stale = session.info.pop(_STALE_PLAY_ROWS, None)
+    if stale:
+        with _play_rows_lock:
+            for quiz_id in stale:
+                _play_rows_cache.pop(quiz_id, None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stale_play_rows(session):
+    """Rollback: nada mudou no banco, o cache continua válido"""
+    session.info.pop(_STALE_PLAY_ROWS, None)
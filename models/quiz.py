@@ -9,48 +9,137 @@ Define a estrutura dos quizzes com:
 - Upload de imagens
 """
 
-from datetime import datetime
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import cached_property
+from itertools import permutations
+from threading import Lock
 import random
+from cachetools import TTLCache, cached
 from flask import current_app
-from flask_sqlalchemy import SQLAlchemy
-
-# Obter instância do SQLAlchemy do Flask de forma segura
-def get_db():
-    return current_app.extensions['sqlalchemy']
-
-
-class Quiz:
+from sqlalchemy import case, cast, event, func, select, update
+from sqlalchemy.orm import selectinload, lazyload, load_only, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.ext.hybrid import hybrid_property
+
+# Usar a mesma instância db do app.py (um único registro de modelos)
+from app import db
+from models.loaders import strict
+from models.question import Question
+from models.user import QuizResult
+from utils.helpers import batch_iter
+
+# Rótulos e cores dos status (consultados a cada linha nas listagens)
+STATUS_DISPLAY = {
+    'active': 'Ativo',
+    'inactive': 'Inativo',
+    'archived': 'Arquivado',
+    'deleted': 'Excluído'
+}
+STATUS_COLORS = {
+    'active': 'success',
+    'inactive': 'warning',
+    'archived': 'secondary',
+    'deleted': 'danger'
+}
+
+# Campos alterados por cada mudança de status (ver Quiz.bulk_set_status)
+STATUS_CHANGES = {
+    'archived': {'is_archived': True, 'is_active': False},
+    'deleted': {'is_deleted': True, 'is_active': False},
+    'active': {'is_deleted': False, 'is_archived': False, 'is_active': True}
+}
+
+# Condição dos quizzes jogáveis (mesmo filtro de Quiz.active_query)
+_LISTABLE_CONDITION = 'is_active AND NOT is_archived AND NOT is_deleted AND question_count > 0'
+
+# Aba "ativos" do gerenciamento (mesmo filtro de status de manage(), com ou sem questões)
+_MANAGE_ACTIVE_CONDITION = 'is_active AND NOT is_archived AND NOT is_deleted'
+
+# Todas as ordens possíveis para 1 a 4 alternativas (no máximo 4! = 24 cada):
+# embaralhar vira sortear uma única entrada em vez de um sorteio por posição
+_PERMUTATIONS = {n: tuple(permutations(range(n))) for n in range(1, 5)}
+_LETTERS = ('A', 'B', 'C', 'D')
+
+# Gerador próprio do módulo para embaralhamentos sem seed
+_rng = random.Random()
+
+# Listagem de quizzes disponíveis (igual para todos os alunos), por processo;
+# guarda dicionários simples, nunca objetos ligados a uma sessão
+_listing_cache = TTLCache(maxsize=8, ttl=30)
+_listing_lock = Lock()
+
+# Alternativa preparada para o jogo. Tupla: vai para o template (tojson) e
+# para a sessão como lista [texto, correta, letra], sem repetir as chaves
+Alternative = namedtuple('Alternative', 'text is_correct letter')
+
+
+class Quiz(db.Model):
     """
     Modelo de quiz do sistema Brainchild
     """
 
-    def __init__(self):
-        # Obter db dinamicamente para evitar importação circular
-        self.db = get_db()
-        self.__tablename__ = 'quizzes'
-
-    @classmethod
-    def create_table(cls, db):
-        """Cria tabela dinamicamente"""
-        return db.Table('quizzes',
-            db.Column('id', db.Integer, primary_key=True),
-            db.Column('title', db.String(200), nullable=False),
-            db.Column('description', db.Text, nullable=True),
-            db.Column('created_by', db.Integer, db.ForeignKey('users.id'), nullable=False),
-            db.Column('created_at', db.DateTime, default=datetime.utcnow),
-            db.Column('updated_at', db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow),
-            
-            # Sistema de status simplificado
-            db.Column('is_active', db.Boolean, default=True, nullable=False),
-            db.Column('is_archived', db.Boolean, default=False, nullable=False),
-            db.Column('is_deleted', db.Boolean, default=False, nullable=False),
-            
-            # Configurações opcionais
-            db.Column('image_filename', db.String(255), nullable=True),
-            db.Column('time_limit', db.Integer, nullable=True),
-            db.Column('shuffle_questions', db.Boolean, default=True),
-            db.Column('shuffle_answers', db.Boolean, default=True)
-        )
+    __tablename__ = 'quizzes'
+    __table_args__ = (
+        # Índice parcial para Quiz.active_query(): só contém os quizzes jogáveis,
+        # já na ordem da listagem (cresce com os ativos, não com o total)
+        db.Index('ix_quizzes_listable', 'created_at',
+                 postgresql_where=db.text(_LISTABLE_CONDITION),
+                 sqlite_where=db.text(_LISTABLE_CONDITION)),
+        # Mesmo recorte, ordenado por tentativas (quizzes populares)
+        db.Index('ix_quizzes_listable_attempts', 'total_attempts',
+                 postgresql_where=db.text(_LISTABLE_CONDITION),
+                 sqlite_where=db.text(_LISTABLE_CONDITION)),
+        # "Meus quizzes" do moderador: filtra por criador, ordena por data
+        db.Index('ix_quizzes_creator_created', 'created_by', 'created_at'),
+        # Gerenciamento, aba padrão: quizzes ativos do criador já na ordem da página
+        # (os filtros de status ficam no predicado; arquivados/excluídos usam o índice acima)
+        db.Index('ix_quizzes_creator_active_created', 'created_by', 'created_at',
+                 postgresql_where=db.text(_MANAGE_ACTIVE_CONDITION),
+                 sqlite_where=db.text(_MANAGE_ACTIVE_CONDITION)),
+        # "Meus quizzes mais populares": filtra por criador, ordena por tentativas
+        db.Index('ix_quizzes_creator_attempts', 'created_by', 'total_attempts'),
+        # Busca por trecho do título (ILIKE '%termo%'): índice trigram, só no PostgreSQL
+        db.Index('ix_quizzes_title_trgm', 'title', postgresql_using='gin',
+                 postgresql_ops={'title': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
+
+    # Campos básicos
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Sistema de status
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    is_archived = db.Column(db.Boolean, default=False, nullable=False)
+    is_deleted = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Configurações
+    image_filename = db.Column(db.String(255), nullable=True)
+    time_limit = db.Column(db.Integer, nullable=True)
+    shuffle_questions = db.Column(db.Boolean, default=True)
+    shuffle_answers = db.Column(db.Boolean, default=True)
+
+    # Número de questões, mantido pelos eventos de Question (ver _adjust_question_count)
+    question_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+
+    # Totais de jogadas, atualizados atomicamente a cada resultado (ver _record_attempt)
+    total_attempts = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    average_score = db.Column(db.Float, default=0, nullable=False, server_default='0')
+
+    # Relacionamentos
+    # selectin: carrega as questões de todos os quizzes da consulta em um único IN
+    questions = db.relationship('Question', back_populates='quiz', lazy='selectin',
+                                cascade='all, delete-orphan',
+                                order_by='Question.order_index')
+    results = db.relationship('QuizResult', back_populates='quiz', lazy='select',
+                              cascade='all, delete-orphan')
+    # Muitos-para-um: o lazy load consulta o identity map antes de ir ao banco
+    creator = db.relationship('User', back_populates='quizzes')
 
     def __init__(self, title, description, created_by, image_filename=None, time_limit=None):
         self.title = title
@@ -58,33 +147,80 @@ class Quiz:
         self.created_by = created_by
         self.image_filename = image_filename
         self.time_limit = time_limit
-        self.is_active = True
-        self.is_archived = False
-        self.is_deleted = False
-        self.shuffle_questions = True
-        self.shuffle_answers = True
-        self.created_at = datetime.utcnow()
-        self.updated_at = datetime.utcnow()
-
-    @property
-    def question_count(self):
-        """Retorna o número de questões do quiz"""
-        try:
-            from models.question import Question
-            return Question.query.filter_by(quiz_id=self.id).count()
-        except:
-            return 0
-
-    @property 
-    def creator(self):
-        """Retorna o criador do quiz"""
-        try:
-            from models.user import User
-            return User.query.get(self.created_by)
-        except:
-            return None
 
-    @property
+    @classmethod
+    def list_query(cls, include_results=False):
+        """
+        Query base das listagens de quizzes. Em modo debug, qualquer relacionamento
+        não carregado explicitamente gera erro em vez de um SELECT por linha (N+1).
+        As questões não são carregadas: as listagens usam só question_count
+        """
+        # O criador aparece em toda linha da listagem; as questões (selectin por
+        # padrão no relacionamento) só são buscadas se alguém acessá-las
+        options = [selectinload(cls.creator), lazyload(cls.questions)]
+        if include_results:
+            options.append(selectinload(cls.results))
+        return cls.query.options(*strict(*options))
+
+    @classmethod
+    def manage_query(cls):
+        """
+        Query da página de gerenciamento: list_query() com só as colunas que a
+        página mostra (updated_at, configurações do jogo e média ficam de fora)
+        """
+        return cls.list_query().options(load_only(
+            cls.id, cls.title, cls.description, cls.created_by, cls.created_at,
+            cls.is_active, cls.is_archived, cls.is_deleted, cls.image_filename,
+            cls.question_count, cls.total_attempts
+        ))
+
+    @classmethod
+    def active_query(cls):
+        """Query dos quizzes disponíveis para jogar, mais recentes primeiro"""
+        return (cls.query
+                .filter(cls.is_active.is_(True),
+                        cls.is_archived.is_(False),
+                        cls.is_deleted.is_(False),
+                        cls.question_count > 0)
+                .order_by(cls.created_at.desc()))
+
+    @classmethod
+    @cached(_listing_cache, key=lambda cls, limit=10: limit, lock=_listing_lock)
+    def available_listing(cls, limit=10):
+        """
+        Os quizzes disponíveis mais recentes como dicionários (id, título, descrição,
+        imagem, tempo limite e nº de questões), em cache por 30 s. Mudanças de status limpam o cache
+        """
+        rows = (cls.active_query()
+                .with_entities(cls.id, cls.title, cls.description,
+                               cls.image_filename, cls.time_limit, cls.question_count)
+                .limit(limit))
+        return [row._asdict() for row in rows]
+
+    @classmethod
+    def refresh_question_counts(cls):
+        """Recalcula question_count de todos os quizzes a partir da tabela de questões"""
+        count = (select(func.count(Question.id))
+                 .where(Question.quiz_id == cls.id)
+                 .scalar_subquery())
+        db.session.execute(update(cls).values(question_count=count, updated_at=cls.updated_at)
+                           .execution_options(synchronize_session=False))
+
+    @classmethod
+    def refresh_attempt_stats(cls):
+        """Recalcula total_attempts e average_score de todos os quizzes a partir dos resultados"""
+        percentage = QuizResult.score * 100.0 / func.nullif(QuizResult.total_questions, 0)
+        attempts = (select(func.count(QuizResult.id))
+                    .where(QuizResult.quiz_id == cls.id)
+                    .scalar_subquery())
+        average = (select(func.coalesce(func.avg(percentage), 0))
+                   .where(QuizResult.quiz_id == cls.id)
+                   .scalar_subquery())
+        db.session.execute(update(cls).values(total_attempts=attempts, average_score=average,
+                                              updated_at=cls.updated_at)
+                           .execution_options(synchronize_session=False))
+
+    @hybrid_property
     def status(self):
         """Retorna status baseado nos campos booleanos"""
         if self.is_deleted:
@@ -96,13 +232,17 @@ class Quiz:
         else:
             return 'inactive'
 
+    @status.expression
+    def status(cls):
+        """Mesma regra em SQL, para filtros como Quiz.status == 'active'"""
+        return case((cls.is_deleted, 'deleted'),
+                    (cls.is_archived, 'archived'),
+                    (cls.is_active, 'active'),
+                    else_='inactive')
+
     def get_questions(self):
-        """Retorna questões do quiz"""
-        try:
-            from models.question import Question
-            return Question.query.filter_by(quiz_id=self.id).order_by(Question.order_index).all()
-        except:
-            return []
+        """Retorna questões do quiz (já ordenadas pelo relacionamento)"""
+        return list(self.questions)
 
     def can_be_played(self):
         """Verifica se o quiz pode ser jogado"""
@@ -115,51 +255,47 @@ class Quiz:
         """Verifica se pode ser editado"""
         return not self.is_deleted
 
-    def get_questions_for_play(self):
-        """Retorna questões preparadas para jogar"""
+    def get_questions_for_play(self, seed=None):
+        """
+        Prepara as questões para o jogo. Com a mesma seed o embaralhamento
+        é sempre o mesmo (sem seed, usa uma aleatória)
+        """
+        # Sem seed, reaproveita o gerador do módulo (Random() novo lê os.urandom a cada chamada)
+        rng = _rng if seed is None else random.Random(seed)
+        # Só as colunas do jogo; o embaralhamento continua em Python porque
+        # ORDER BY random() não aceita seed e a tentativa precisa ser reprodutível
+        # As linhas do banco vêm do cache por quiz; a cópia é que é embaralhada
+        return self._prepare_for_play(list(Question.cached_play_rows(self.id)), rng)
+
+    def _prepare_for_play(self, questions, rng):
+        """
+        Embaralha e formata as questões conforme as configurações do quiz.
+        questions são linhas de Question.play_rows (ou objetos Question)
+        """
         prepared_questions = []
-        
+
         try:
-            questions = self.get_questions()
             if self.shuffle_questions:
-                random.shuffle(questions)
+                rng.shuffle(questions)
 
             for index, question in enumerate(questions):
-                # Criar alternativas
-                alternatives = []
-
-                # Resposta correta
-                alternatives.append({
-                    'text': question.correct_answer,
-                    'is_correct': True,
-                    'letter': 'A'
-                })
-
-                # Respostas incorretas
-                incorrect_options = []
-                for option in [question.option_a, question.option_b, question.option_c]:
-                    if option and option.strip():
-                        incorrect_options.append(option)
-
-                for option in incorrect_options:
-                    alternatives.append({
-                        'text': option,
-                        'is_correct': False,
-                        'letter': 'A'
-                    })
-
-                # Embaralhar respostas
-                if self.shuffle_answers:
-                    random.shuffle(alternatives)
-
-                # Atribuir letras
-                letters = ['A', 'B', 'C', 'D']
-                correct_letter = None
-                
-                for i, alternative in enumerate(alternatives):
-                    alternative['letter'] = letters[i] if i < len(letters) else str(i + 1)
-                    if alternative['is_correct']:
-                        correct_letter = alternative['letter']
+                # Resposta correta sempre na posição 0 antes de embaralhar
+                # (alternativas incorretas vazias ficam de fora)
+                texts = (question.correct_answer,
+                         *(option for option in (question.option_a, question.option_b, question.option_c)
+                           if option and option.strip()))
+                orders = _PERMUTATIONS[len(texts)]
+
+                # Uma única escolha numa tabela de permutações prontas
+                # (a primeira permutação é a ordem original)
+                permutation = rng.choice(orders) if self.shuffle_answers else orders[0]
+
+                # Letras, textos e resposta correta montados numa só passada
+                alternatives = [
+                    Alternative(texts[original], original == 0, _LETTERS[position])
+                    for position, original in enumerate(permutation)
+                ]
+                correct_letter = _LETTERS[permutation.index(0)]
 
                 question_data = {
                     'id': question.id,
@@ -172,259 +308,170 @@ class Quiz:
 
                 prepared_questions.append(question_data)
 
-        except Exception as e:
-            print(f"Erro ao preparar questões: {e}")
+        except Exception:
+            current_app.logger.exception("Erro ao preparar questões")
 
         return prepared_questions
 
+    @classmethod
+    def bulk_set_status(cls, ids, status):
+        """
+        Aplica uma mudança de status ('archived', 'deleted' ou 'active') a vários
+        quizzes com um UPDATE por lote de IDs, sem carregar os objetos.
+        O commit fica a cargo de quem chama (uma transação por requisição)
+        """
+        # updated_at é preenchido pelo onupdate da coluna
+        values = STATUS_CHANGES[status]
+        updated = 0
+        for batch in batch_iter(ids):
+            result = db.session.execute(update(cls).where(cls.id.in_(batch)).values(**values))
+            updated += result.rowcount
+        _listing_cache.clear()
+        return updated
+
     def archive(self):
         """Arquiva o quiz"""
-        try:
-            db = get_db()
-            self.is_archived = True
-            self.is_active = False
-            self.updated_at = datetime.utcnow()
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            raise e
+        self.bulk_set_status([self.id], 'archived')
 
     def delete(self):
         """Marca como excluído"""
-        try:
-            db = get_db()
-            self.is_deleted = True
-            self.is_active = False
-            self.updated_at = datetime.utcnow()
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            raise e
+        self.bulk_set_status([self.id], 'deleted')
 
     def restore(self):
         """Restaura quiz"""
-        try:
-            db = get_db()
-            self.is_deleted = False
-            self.is_archived = False
-            self.is_active = True
-            self.updated_at = datetime.utcnow()
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            raise e
+        self.bulk_set_status([self.id], 'active')
 
-    def get_completion_stats(self):
-        """Retorna estatísticas"""
-        try:
-            from models.user import QuizResult
-            results = QuizResult.query.filter_by(quiz_id=self.id).all()
-            
-            if not results:
-                return {
-                    'total_attempts': 0,
-                    'average_score': 0,
-                    'best_score': 0,
-                    'worst_score': 0,
-                    'completion_rate': 0,
-                    'average_time': 0
-                }
+    @classmethod
+    def completion_stats_sql(cls, quiz_id, recent_days=30):
+        """
+        Estatísticas dos resultados do quiz calculadas pelo banco:
+        uma única linha agregada em vez de carregar todos os QuizResult.
+        As jogadas dos últimos recent_days dias saem da mesma varredura (agregado condicional)
+        """
+        recent_since = datetime.utcnow() - timedelta(days=recent_days)
+        recent = func.sum(case((QuizResult.completed_at >= recent_since, 1), else_=0))
+
+        # No PostgreSQL o banco já devolve os valores arredondados (round(numeric, int));
+        # no SQLite o round() opera em float e o arredondamento fica no Python
+        round_in_sql = db.engine.dialect.name == 'postgresql'
+
+        if round_in_sql:
+            percentage = cast(QuizResult.score, db.Numeric) * 100 / func.nullif(QuizResult.total_questions, 0)
+            columns = (func.round(func.avg(percentage), 1),
+                       func.round(func.max(percentage), 1),
+                       func.round(func.min(percentage), 1),
+                       func.round(func.avg(QuizResult.time_spent)))
+        else:
+            percentage = QuizResult.score * 100.0 / func.nullif(QuizResult.total_questions, 0)
+            columns = (func.avg(percentage),
+                       func.max(percentage),
+                       func.min(percentage),
+                       func.avg(QuizResult.time_spent))
+
+        total, recent_total, average, best, worst, average_time = (
+            db.session.query(func.count(QuizResult.id), recent, *columns)
+            .filter(QuizResult.quiz_id == quiz_id)
+            .one()
+        )
 
-            percentages = [r.percentage_score for r in results if hasattr(r, 'percentage_score')]
-            times = [r.time_spent for r in results if hasattr(r, 'time_spent') and r.time_spent]
-
-            return {
-                'total_attempts': len(results),
-                'average_score': round(sum(percentages) / len(percentages), 1) if percentages else 0,
-                'best_score': max(percentages) if percentages else 0,
-                'worst_score': min(percentages) if percentages else 0,
-                'completion_rate': 100,
-                'average_time': round(sum(times) / len(times), 0) if times else 0
-            }
-        except:
-            return {
-                'total_attempts': 0, 'average_score': 0, 'best_score': 0,
-                'worst_score': 0, 'completion_rate': 0, 'average_time': 0
-            }
+        if not round_in_sql:
+            average, best, worst = (round(value or 0, 1) for value in (average, best, worst))
+            average_time = round(average_time or 0)
+
+        return {
+            'total_attempts': total,
+            'recent_attempts': int(recent_total or 0),
+            'average_score': float(average or 0),
+            'best_score': float(best or 0),
+            'worst_score': float(worst or 0),
+            'completion_rate': 100 if total else 0,
+            'average_time': int(average_time or 0)
+        }
 
-    def has_image(self):
-        """Verifica se tem imagem"""
-        return self.image_filename is not None and self.image_filename.strip() != ''
+    @cached_property
+    def completion_stats(self):
+        """Estatísticas calculadas uma vez por instância (template pode ler várias vezes)"""
+        return self.completion_stats_sql(self.id)
+
+    def get_completion_stats(self):
+        """Retorna estatísticas"""
+        return self.completion_stats
 
     def get_status_display(self):
         """Status em português"""
-        statuses = {
-            'active': 'Ativo',
-            'inactive': 'Inativo', 
-            'archived': 'Arquivado',
-            'deleted': 'Excluído'
-        }
-        return statuses.get(self.status, 'Desconhecido')
+        return STATUS_DISPLAY.get(self.status, 'Desconhecido')
 
     def get_status_color(self):
         """Cor do badge do status"""
-        colors = {
-            'active': 'success',
-            'inactive': 'warning',
-            'archived': 'secondary', 
-            'deleted': 'danger'
-        }
-        return colors.get(self.status, 'light')
+        return STATUS_COLORS.get(self.status, 'light')
+
+    def has_image(self):
+        """Verifica se tem imagem"""
+        filename = self.image_filename
+        return bool(filename) and not filename.isspace()
 
     def __repr__(self):
         return f'<Quiz {self.title} ({self.status})>'
 
 
-# Modelo compatível com SQLAlchemy tradicional
-try:
-    from app import db
-    
-    class Quiz(db.Model):
-        __tablename__ = 'quizzes'
-
-        # Campos básicos
-        id = db.Column(db.Integer, primary_key=True)
-        title = db.Column(db.String(200), nullable=False)
-        description = db.Column(db.Text, nullable=True)
-        created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-        created_at = db.Column(db.DateTime, default=datetime.utcnow)
-        updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-
-        # Sistema de status
-        is_active = db.Column(db.Boolean, default=True, nullable=False)
-        is_archived = db.Column(db.Boolean, default=False, nullable=False)
-        is_deleted = db.Column(db.Boolean, default=False, nullable=False)
-
-        # Configurações
-        image_filename = db.Column(db.String(255), nullable=True)
-        time_limit = db.Column(db.Integer, nullable=True)
-        shuffle_questions = db.Column(db.Boolean, default=True)
-        shuffle_answers = db.Column(db.Boolean, default=True)
-
-        # Relacionamentos
-        questions = db.relationship('Question', backref='quiz', lazy=True, 
-                                   cascade='all, delete-orphan',
-                                   order_by='Question.order_index')
-        
-        def __init__(self, title, description, created_by, image_filename=None, time_limit=None):
-            self.title = title
-            self.description = description
-            self.created_by = created_by
-            self.image_filename = image_filename
-            self.time_limit = time_limit
-
-        @property
-        def question_count(self):
-            try:
-                return len(self.questions) if self.questions else 0
-            except:
-                return 0
-
-        @property
-        def creator(self):
-            try:
-                from models.user import User
-                return User.query.get(self.created_by)
-            except:
-                return None
-
-        @property
-        def status(self):
-            if self.is_deleted:
-                return 'deleted'
-            elif self.is_archived:
-                return 'archived'
-            elif self.is_active:
-                return 'active'
-            else:
-                return 'inactive'
-
-        def can_be_played(self):
-            return (self.is_active and 
-                    not self.is_archived and 
-                    not self.is_deleted and
-                    self.question_count > 0)
-
-        def get_questions_for_play(self):
-            prepared_questions = []
-            
-            try:
-                questions = list(self.questions) if self.questions else []
-                if self.shuffle_questions:
-                    random.shuffle(questions)
-
-                for index, question in enumerate(questions):
-                    alternatives = []
-
-                    alternatives.append({
-                        'text': question.correct_answer,
-                        'is_correct': True,
-                        'letter': 'A'
-                    })
-
-                    incorrect_options = []
-                    for option in [question.option_a, question.option_b, question.option_c]:
-                        if option and option.strip():
-                            incorrect_options.append(option)
-
-                    for option in incorrect_options:
-                        alternatives.append({
-                            'text': option,
-                            'is_correct': False,
-                            'letter': 'A'
-                        })
-
-                    if self.shuffle_answers:
-                        random.shuffle(alternatives)
-
-                    letters = ['A', 'B', 'C', 'D']
-                    correct_letter = None
-                    
-                    for i, alternative in enumerate(alternatives):
-                        alternative['letter'] = letters[i] if i < len(letters) else str(i + 1)
-                        if alternative['is_correct']:
-                            correct_letter = alternative['letter']
-
-                    question_data = {
-                        'id': question.id,
-                        'text': question.question_text,
-                        'image_filename': question.image_filename,
-                        'alternatives': alternatives,
-                        'correct_letter': correct_letter,
-                        'order_index': index + 1
-                    }
-
-                    prepared_questions.append(question_data)
-
-            except Exception as e:
-                print(f"Erro ao preparar questões: {e}")
-
-            return prepared_questions
-
-        def get_status_display(self):
-            statuses = {
-                'active': 'Ativo',
-                'inactive': 'Inativo',
-                'archived': 'Arquivado', 
-                'deleted': 'Excluído'
-            }
-            return statuses.get(self.status, 'Desconhecido')
-
-        def get_status_color(self):
-            colors = {
-                'active': 'success',
-                'inactive': 'warning',
-                'archived': 'secondary',
-                'deleted': 'danger'
-            }
-            return colors.get(self.status, 'light')
-
-        def has_image(self):
-            return self.image_filename is not None and self.image_filename.strip() != ''
-
-        def __repr__(self):
-            return f'<Quiz {self.title} ({self.status})>'
-
-except ImportError:
-    # Se não conseguir importar, usar modelo básico
-    pass
+# Contador de questões mantido pelos eventos de Question
+def _adjust_question_count(connection, question, delta):
+    """Soma delta ao contador do quiz direto no banco (sem carregar o Quiz)"""
+    quizzes = Quiz.__table__
+    connection.execute(
+        update(quizzes)
+        .where(quizzes.c.id == question.quiz_id)
+        .values(question_count=quizzes.c.question_count + delta)
+    )
+
+    # Se o quiz já está carregado na sessão, acompanhar o valor do banco
+    # (sem marcá-lo como alterado e sem novo SELECT)
+    session = object_session(question)
+    quiz = session.identity_map.get(identity_key(Quiz, question.quiz_id)) if session else None
+    if quiz is not None and 'question_count' in quiz.__dict__:
+        set_committed_value(quiz, 'question_count', quiz.question_count + delta)
+
+
+def _clear_completion_stats(target, *args):
+    """Recarregar o quiz do banco descarta as estatísticas em cache"""
+    # O evento de expire pode chegar sem instância (objeto já coletado no commit)
+    if target is None:
+        return
+    target.__dict__.pop('completion_stats', None)
+
+
+event.listen(Quiz, 'refresh', _clear_completion_stats)
+event.listen(Quiz, 'expire', _clear_completion_stats)
+
+
+@event.listens_for(Question, 'after_insert')
+def _question_inserted(mapper, connection, target):
+    _adjust_question_count(connection, target, 1)
+
+
+@event.listens_for(Question, 'after_delete')
+def _question_deleted(mapper, connection, target):
+    _adjust_question_count(connection, target, -1)
+
+
+# Totais de jogadas do quiz somados direto no banco quando um resultado é salvo,
+# no mesmo evento que os totais do usuário (ver _add_result_totals em models/user.py)
+@event.listens_for(QuizResult, 'after_insert')
+def _record_attempt(mapper, connection, result):
+    """
+    Um único UPDATE atômico: soma a tentativa e atualiza a média incremental
+    (média * n + percentual) / (n + 1); no SET os valores lidos são os de antes
+    do UPDATE. refresh_attempt_stats recalcula tudo a partir dos resultados
+    """
+    quizzes = Quiz.__table__
+    # updated_at fixo: uma jogada não é uma edição do quiz (onupdate da coluna)
+    values = {'total_attempts': quizzes.c.total_attempts + 1,
+              'updated_at': quizzes.c.updated_at}
+    if result.total_questions:
+        percentage = result.score * 100.0 / result.total_questions
+        values['average_score'] = (
+            (quizzes.c.average_score * quizzes.c.total_attempts + percentage)
+            / (quizzes.c.total_attempts + 1)
+        )
+
+    connection.execute(update(quizzes).where(quizzes.c.id == result.quiz_id).values(**values))
@@ -9,17 +9,48 @@ Define a estrutura dos usuários e suas permissões:
 """
 
 from datetime import datetime
+from threading import Lock
+from cachetools import TTLCache, cached
+from flask import current_app
 from flask_login import UserMixin
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
-
-# Usar a mesma instância db do app.py - MANTER IMPORTAÇÃO ORIGINAL
-try:
-    from app import db
-except ImportError:
-    # Fallback caso haja problema de importação circular
-    from flask import current_app
-    db = current_app.extensions['sqlalchemy']
+from sqlalchemy import case, event, func, select, update
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import load_only
+from utils.helpers import hash_password, verify_password, password_needs_rehash, batch_iter
+
+# Usar a mesma instância db do app.py (única para todos os modelos)
+from app import db
+
+
+USER_TYPE_DISPLAY = {
+    'admin': 'Administrador',
+    'moderator': 'Moderador',
+    'student': 'Aluno'
+}
+USER_TYPE_COLORS = {
+    'admin': 'danger',  # Vermelho
+    'moderator': 'warning',  # Amarelo
+    'student': 'primary'  # Azul
+}
+
+# Permissões em bits; cada tipo de usuário tem a sua máscara pronta
+PERM_CREATE_QUIZ = 1
+PERM_APPROVE_USERS = 2
+PERM_MANAGE_ALL_QUIZZES = 4
+PERM_PROMOTE_USERS = 8
+PERM_ADMIN_PANEL = 16
+
+USER_TYPE_PERMISSIONS = {
+    'admin': (PERM_CREATE_QUIZ | PERM_APPROVE_USERS | PERM_MANAGE_ALL_QUIZZES |
+              PERM_PROMOTE_USERS | PERM_ADMIN_PANEL),
+    'moderator': PERM_CREATE_QUIZ | PERM_APPROVE_USERS,
+    'student': 0
+}
+
+
+# Nº de cadastros pendentes (badge do menu, calculado em toda página de admin/moderador)
+_pending_count_cache = TTLCache(maxsize=1, ttl=15)
+_pending_count_lock = Lock()
 
 
 class User(UserMixin, db.Model):
@@ -29,6 +60,22 @@ class User(UserMixin, db.Model):
     """
 
     __tablename__ = 'users'
+    __table_args__ = (
+        # Índice parcial só com os cadastros pendentes (contagem do menu e lista de
+        # aprovação, mais recentes primeiro); fica pequeno porque quase todos são aprovados
+        db.Index('ix_users_pending', 'created_at',
+                 postgresql_where=db.text('NOT is_approved'),
+                 sqlite_where=db.text('NOT is_approved')),
+        # Usuários recentes, gestão de usuários e crescimento por dia (filtro/ordem por data)
+        db.Index('ix_users_created', 'created_at'),
+        # Busca de usuários por trecho (ILIKE '%termo%' em qualquer uma das colunas):
+        # um GIN trigram multicoluna, só no PostgreSQL
+        db.Index('ix_users_search_trgm', 'username', 'first_name', 'last_name', 'email',
+                 postgresql_using='gin',
+                 postgresql_ops={'username': 'gin_trgm_ops', 'first_name': 'gin_trgm_ops',
+                                 'last_name': 'gin_trgm_ops', 'email': 'gin_trgm_ops'}
+                 ).ddl_if(dialect='postgresql'),
+    )
 
     # Campos da tabela
     id = db.Column(db.Integer, primary_key=True)
@@ -43,13 +90,20 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Relacionamentos com outras tabelas - definir apenas se as tabelas existirem
-    try:
-        quizzes = db.relationship('Quiz', backref='creator', lazy=True, cascade='all, delete-orphan')
-        quiz_results = db.relationship('QuizResult', backref='user', lazy=True, cascade='all, delete-orphan')
-    except:
-        # Se as tabelas Quiz/QuizResult não existirem ainda, ignorar relacionamentos
-        pass
+    # Totais dos resultados do usuário, atualizados a cada resultado salvo
+    # (ver _add_result_totals); refresh_result_totals recalcula a partir de quiz_results
+    quizzes_played = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    score_total = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    questions_answered = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    best_percentage = db.Column(db.Float, default=0, nullable=False, server_default='0')
+    time_spent_total = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+
+    # Relacionamentos com outras tabelas
+    # lazy='select' de propósito: o usuário logado é carregado em toda requisição
+    # e selectin traria todos os quizzes/resultados dele sem necessidade
+    quizzes = db.relationship('Quiz', back_populates='creator', lazy='select', cascade='all, delete-orphan')
+    quiz_results = db.relationship('QuizResult', back_populates='user', lazy='select',
+                                   cascade='all, delete-orphan')
 
     def __init__(self, username, email, password_hash, first_name, last_name, phone='', user_type='student',
                  is_approved=False):
@@ -65,11 +119,15 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Define nova senha usando hash seguro"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Verifica se a senha fornecida está correta"""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Verifica se o hash da senha está em formato antigo (ex.: PBKDF2)"""
+        return password_needs_rehash(self.password_hash)
 
     @property
     def full_name(self):
@@ -93,48 +151,47 @@ class User(UserMixin, db.Model):
         return self.user_type == 'student'
 
     # Propriedades de permissões
+    @property
+    def permissions(self):
+        """Máscara de permissões do tipo de usuário (ver USER_TYPE_PERMISSIONS)"""
+        return USER_TYPE_PERMISSIONS.get(self.user_type, 0)
+
+    def has_permission(self, permission):
+        """Verifica um ou mais bits PERM_* (todos precisam estar presentes)"""
+        return self.permissions & permission == permission
+
     @property
     def can_create_quiz(self):
         """Verifica se pode criar quizzes"""
-        return self.user_type in ['admin', 'moderator']
+        return self.has_permission(PERM_CREATE_QUIZ)
 
     @property
     def can_approve_users(self):
         """Verifica se pode aprovar cadastros pendentes"""
-        return self.user_type in ['admin', 'moderator']
+        return self.has_permission(PERM_APPROVE_USERS)
 
     @property
     def can_manage_all_quizzes(self):
         """Verifica se pode gerenciar todos os quizzes (arquivar/excluir)"""
-        return self.user_type == 'admin'
+        return self.has_permission(PERM_MANAGE_ALL_QUIZZES)
 
     @property
     def can_promote_users(self):
         """Verifica se pode promover/rebaixar usuários"""
-        return self.user_type == 'admin'
+        return self.has_permission(PERM_PROMOTE_USERS)
 
     @property
     def can_access_admin_panel(self):
         """Verifica se pode acessar painel administrativo"""
-        return self.user_type == 'admin'
+        return self.has_permission(PERM_ADMIN_PANEL)
 
     def get_user_type_display(self):
         """Retorna o tipo de usuário em português"""
-        types = {
-            'admin': 'Administrador',
-            'moderator': 'Moderador',
-            'student': 'Aluno'
-        }
-        return types.get(self.user_type, 'Desconhecido')
+        return USER_TYPE_DISPLAY.get(self.user_type, 'Desconhecido')
 
     def get_user_type_color(self):
         """Retorna cor do badge do tipo de usuário"""
-        colors = {
-            'admin': 'danger',  # Vermelho
-            'moderator': 'warning',  # Amarelo
-            'student': 'primary'  # Azul
-        }
-        return colors.get(self.user_type, 'secondary')
+        return USER_TYPE_COLORS.get(self.user_type, 'secondary')
 
     def promote_to_moderator(self):
         """Promove aluno para moderador"""
@@ -154,6 +211,69 @@ class User(UserMixin, db.Model):
         """Aprova cadastro pendente"""
         self.is_approved = True
 
+    @classmethod
+    def list_query(cls):
+        """
+        Query base das listagens de usuários: só as colunas que as telas exibem
+        (nunca password_hash nem os totais de resultados)
+        """
+        return cls.query.options(load_only(cls.id, cls.username, cls.email, cls.first_name,
+                                           cls.last_name, cls.phone, cls.user_type,
+                                           cls.is_approved, cls.created_at))
+
+    @property
+    def average_percentage(self):
+        """Média ponderada dos acertos (total de acertos / total de questões)"""
+        if not self.questions_answered:
+            return 0
+        return self.score_total * 100 / self.questions_answered
+
+    @classmethod
+    def refresh_result_totals(cls):
+        """Recalcula os totais de resultados de todos os usuários a partir de quiz_results"""
+        def total(expression):
+            return (select(func.coalesce(expression, 0))
+                    .where(QuizResult.user_id == cls.id)
+                    .scalar_subquery())
+
+        percentage = QuizResult.score * 100.0 / func.nullif(QuizResult.total_questions, 0)
+        # updated_at fixo: recalcular estatísticas não é uma edição do perfil
+        db.session.execute(
+            update(cls)
+            .values(quizzes_played=total(func.count(QuizResult.id)),
+                    score_total=total(func.sum(QuizResult.score)),
+                    questions_answered=total(func.sum(QuizResult.total_questions)),
+                    best_percentage=total(func.max(percentage)),
+                    time_spent_total=total(func.sum(QuizResult.time_spent)),
+                    updated_at=cls.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def approve_many(cls, ids):
+        """
+        Aprova vários cadastros pendentes com um UPDATE por lote de IDs, sem carregar
+        os objetos. Retorna quantos foram aprovados; o commit fica a cargo de quem chama
+        """
+        approved = 0
+        for batch in batch_iter(ids):
+            result = db.session.execute(
+                update(cls)
+                .where(cls.id.in_(batch), cls.is_approved.is_(False))
+                .values(is_approved=True)
+                .execution_options(synchronize_session=False)
+            )
+            approved += result.rowcount
+        # UPDATE em massa não dispara os eventos do mapper
+        _pending_count_cache.clear()
+        return approved
+
+    @classmethod
+    @cached(_pending_count_cache, key=lambda cls: 'pending', lock=_pending_count_lock)
+    def pending_count(cls):
+        """Nº de cadastros aguardando aprovação (em cache; limpo quando um usuário muda)"""
+        return cls.query.filter_by(is_approved=False).count()
+
     def reject(self):
         """Rejeita e remove cadastro pendente"""
         # Será implementado na lógica de rotas
@@ -163,56 +283,36 @@ class User(UserMixin, db.Model):
         """Retorna estatísticas dos quizzes do usuário"""
         try:
             if self.is_student:
-                # Estatísticas para alunos (quizzes jogados)
-                quiz_results = getattr(self, 'quiz_results', [])
-                total_played = len(quiz_results)
-                
-                if total_played == 0:
-                    return {
-                        'quizzes_played': 0,
-                        'average_score': 0,
-                        'best_score': 0,
-                        'total_questions_answered': 0
-                    }
-
-                scores = []
-                total_questions = 0
-                for r in quiz_results:
-                    if hasattr(r, 'total_questions') and r.total_questions > 0:
-                        scores.append((r.score / r.total_questions) * 100)
-                        total_questions += r.total_questions
-
+                # Estatísticas para alunos (quizzes jogados) - totais já na linha do usuário
                 return {
-                    'quizzes_played': total_played,
-                    'average_score': round(sum(scores) / len(scores), 1) if scores else 0,
-                    'best_score': round(max(scores), 1) if scores else 0,
-                    'total_questions_answered': total_questions
+                    'quizzes_played': self.quizzes_played,
+                    'average_score': round(self.average_percentage, 1),
+                    'best_score': round(self.best_percentage, 1),
+                    'total_questions_answered': self.questions_answered
                 }
             else:
-                # Estatísticas para moderadores/admins (quizzes criados)
-                quizzes = getattr(self, 'quizzes', [])
-                total_created = len(quizzes)
-                active_quizzes = 0
-                total_questions = 0
-                total_plays = 0
-                
-                for q in quizzes:
-                    if hasattr(q, 'is_active') and q.is_active and not getattr(q, 'is_deleted', False):
-                        active_quizzes += 1
-                    if hasattr(q, 'questions'):
-                        total_questions += len(q.questions)
-                    if hasattr(q, 'results'):
-                        total_plays += len(q.results)
+                # Estatísticas para moderadores/admins (quizzes criados) - uma linha agregada
+                # sobre os contadores desnormalizados de quizzes (sem carregar questões/resultados)
+                from models.quiz import Quiz  # import local: models.quiz importa este módulo
+
+                created, active, total_questions, total_plays = (
+                    db.session.query(func.count(Quiz.id),
+                                     func.sum(case((Quiz.is_active & ~Quiz.is_deleted, 1), else_=0)),
+                                     func.sum(Quiz.question_count),
+                                     func.sum(Quiz.total_attempts))
+                    .filter(Quiz.created_by == self.id)
+                    .one()
+                )
 
                 return {
-                    'quizzes_created': total_created,
-                    'active_quizzes': active_quizzes,
-                    'total_questions': total_questions,
-                    'total_plays': total_plays
+                    'quizzes_created': created,
+                    'active_quizzes': int(active or 0),
+                    'total_questions': int(total_questions or 0),
+                    'total_plays': int(total_plays or 0)
                 }
-        except Exception as e:
+        except Exception:
             # Em caso de erro, retornar estatísticas vazias
-            print(f"Erro ao calcular estatísticas do usuário {self.id}: {e}")
+            current_app.logger.exception("Erro ao calcular estatísticas do usuário %s", self.id)
             if self.is_student:
                 return {
                     'quizzes_played': 0,
@@ -232,12 +332,30 @@ class User(UserMixin, db.Model):
         return f'<User {self.username} ({self.user_type})>'
 
 
+# Cor de cada nota (consultada a cada linha nas listagens de resultados)
+GRADE_COLORS = {
+    'A': 'success',  # Verde
+    'B': 'info',  # Azul claro
+    'C': 'warning',  # Amarelo
+    'D': 'orange',  # Laranja
+    'F': 'danger'  # Vermelho
+}
+
+
 class QuizResult(db.Model):
     """
     Modelo para armazenar resultados dos quizzes jogados
     """
 
     __tablename__ = 'quiz_results'
+    __table_args__ = (
+        # Resultados recentes por quiz e por usuário (ORDER BY completed_at DESC LIMIT n);
+        # o B-tree é percorrido de trás para frente, então não precisa ser DESC
+        db.Index('ix_quiz_results_quiz_completed', 'quiz_id', 'completed_at'),
+        db.Index('ix_quiz_results_user_completed', 'user_id', 'completed_at'),
+        # Atividade recente geral e jogadas por período (sem filtro de quiz/usuário)
+        db.Index('ix_quiz_results_completed', 'completed_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -247,6 +365,10 @@ class QuizResult(db.Model):
     time_spent = db.Column(db.Integer, nullable=True)  # Tempo em segundos
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Relacionamentos
+    user = db.relationship('User', back_populates='quiz_results')
+    quiz = db.relationship('Quiz', back_populates='results')
+
     def __init__(self, user_id, quiz_id, score, total_questions, time_spent=None):
         self.user_id = user_id
         self.quiz_id = quiz_id
@@ -254,14 +376,20 @@ class QuizResult(db.Model):
         self.total_questions = total_questions
         self.time_spent = time_spent
 
-    @property
+    @hybrid_property
     def percentage_score(self):
         """Retorna pontuação em percentual"""
         if self.total_questions == 0:
             return 0
         return round((self.score / self.total_questions) * 100, 1)
 
-    @property
+    @percentage_score.expression
+    def percentage_score(cls):
+        """Mesmo cálculo em SQL (permite ORDER BY / WHERE pelo percentual)"""
+        return case((cls.total_questions == 0, 0),
+                    else_=func.round(100.0 * cls.score / cls.total_questions, 1))
+
+    @hybrid_property
     def grade_letter(self):
         """Retorna nota em letra baseada na pontuação"""
         percentage = self.percentage_score
@@ -276,18 +404,20 @@ class QuizResult(db.Model):
         else:
             return 'F'
 
+    @grade_letter.expression
+    def grade_letter(cls):
+        """Mesma faixa de notas em SQL (ex.: contar resultados com nota A)"""
+        percentage = cls.percentage_score
+        return case((percentage >= 90, 'A'),
+                    (percentage >= 80, 'B'),
+                    (percentage >= 70, 'C'),
+                    (percentage >= 60, 'D'),
+                    else_='F')
+
     @property
     def grade_color(self):
         """Retorna cor da nota"""
-        grade = self.grade_letter
-        colors = {
-            'A': 'success',  # Verde
-            'B': 'info',  # Azul claro
-            'C': 'warning',  # Amarelo
-            'D': 'orange',  # Laranja
-            'F': 'danger'  # Vermelho
-        }
-        return colors.get(grade, 'secondary')
+        return GRADE_COLORS.get(self.grade_letter, 'secondary')
 
     def get_time_display(self):
         """Retorna tempo formatado"""
@@ -304,3 +434,30 @@ class QuizResult(db.Model):
 
     def __repr__(self):
         return f'<QuizResult {self.user_id}-{self.quiz_id}: {self.score}/{self.total_questions}>'
+
+
+# Qualquer inclusão, alteração ou remoção de usuário invalida a contagem de pendentes
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _clear_pending_count(mapper, connection, target):
+    _pending_count_cache.clear()
+
+
+# Totais do usuário somados direto no banco quando um resultado é salvo (sem carregar o User)
+@event.listens_for(QuizResult, 'after_insert')
+def _add_result_totals(mapper, connection, result):
+    users = User.__table__
+    percentage = result.percentage_score
+    connection.execute(
+        update(users)
+        .where(users.c.id == result.user_id)
+        .values(quizzes_played=users.c.quizzes_played + 1,
+                score_total=users.c.score_total + result.score,
+                questions_answered=users.c.questions_answered + result.total_questions,
+                best_percentage=case((users.c.best_percentage < percentage, percentage),
+                                     else_=users.c.best_percentage),
+                time_spent_total=users.c.time_spent_total + (result.time_spent or 0),
+                # Sem isso o onupdate da coluna marcaria o perfil como editado
+                updated_at=users.c.updated_at)
+    )
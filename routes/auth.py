@@ -12,11 +12,12 @@ Responsável por:
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from models.user import User
 from utils.decorators import admin_or_moderator_required, admin_required
-from utils.helpers import validate_email, validate_password
-import re
+from utils.helpers import (validate_email, validate_password, hash_password, verify_dummy_password,
+                           USERNAME_RE, PHONE_RE)
 
 # Criar blueprint para rotas de autenticação
 auth = Blueprint('auth', __name__)
@@ -44,11 +45,24 @@ def login():
             (User.username == username) | (User.email == username)
         ).first()
 
-        if user and user.check_password(password):
+        # Sem usuário, verifica um hash descartável: a resposta leva o mesmo tempo
+        # que uma senha errada e não revela se o username/email existe
+        if user is not None:
+            password_ok = user.check_password(password)
+        else:
+            password_ok = verify_dummy_password(password)
+
+        if password_ok:
+            # Só informado a quem acertou a senha (não revela nada a terceiros)
             if not user.is_approved:
                 flash('Sua conta ainda não foi aprovada. Aguarde a aprovação de um administrador.', 'warning')
                 return render_template('auth/login.html')
 
+            # Migrar hash antigo (PBKDF2) para Argon2 aproveitando a senha em texto puro
+            if user.password_needs_rehash():
+                user.set_password(password)
+                current_app.extensions['sqlalchemy'].session.commit()
+
             # Login bem-sucedido
             login_user(user, remember=remember)
 
@@ -96,17 +110,12 @@ def register():
                 errors.append('Nome de usuário deve ter pelo menos 3 caracteres.')
             elif len(username) > 80:
                 errors.append('Nome de usuário muito longo.')
-            elif not re.match(r'^[a-zA-Z0-9_]+$', username):
+            elif not USERNAME_RE.match(username):
                 errors.append('Nome de usuário deve conter apenas letras, números e underscore.')
-            elif User.query.filter_by(username=username).first():
-                errors.append('Este nome de usuário já está em uso.')
 
         # Validar email
-        if email:
-            if not validate_email(email):
-                errors.append('Formato de email inválido.')
-            elif User.query.filter_by(email=email).first():
-                errors.append('Este email já está cadastrado.')
+        if email and not validate_email(email):
+            errors.append('Formato de email inválido.')
 
         # Validar senha
         if password:
@@ -125,9 +134,21 @@ def register():
             errors.append('Sobrenome deve ter pelo menos 2 caracteres.')
 
         # Validar telefone (opcional)
-        if phone and not re.match(r'^[\d\s\-\(\)\+]+$', phone):
+        if phone and not PHONE_RE.match(phone):
             errors.append('Formato de telefone inválido.')
 
+        # Username/email já usados: só consulta o banco se o formulário é válido,
+        # e uma única vez para os dois campos
+        if not errors:
+            taken = (User.query
+                     .with_entities(User.username, User.email)
+                     .filter(or_(User.username == username, User.email == email))
+                     .all())
+            if any(row.username == username for row in taken):
+                errors.append('Este nome de usuário já está em uso.')
+            if any(row.email == email for row in taken):
+                errors.append('Este email já está cadastrado.')
+
         # Se há erros, mostrar na página
         if errors:
             for error in errors:
@@ -144,7 +165,7 @@ def register():
             new_user = User(
                 username=username,
                 email=email,
-                password_hash=generate_password_hash(password),
+                password_hash=hash_password(password),
                 first_name=first_name,
                 last_name=last_name,
                 phone=phone,
@@ -158,6 +179,16 @@ def register():
             flash('Cadastro realizado com sucesso! Aguarde a aprovação de um administrador.', 'success')
             return redirect(url_for('auth.login'))
 
+        except IntegrityError:
+            # Outro cadastro com o mesmo username/email entrou entre a checagem e o commit
+            # (as restrições UNIQUE do banco são a verificação definitiva)
+            current_app.extensions['sqlalchemy'].session.rollback()
+            flash('Nome de usuário ou email já cadastrado.', 'error')
+            return render_template('auth/register.html',
+                                   username=username, email=email,
+                                   first_name=first_name, last_name=last_name,
+                                   phone=phone)
+
         except Exception as e:
             current_app.extensions['sqlalchemy'].session.rollback()
             flash('Erro interno. Tente novamente mais tarde.', 'error')
@@ -181,7 +212,7 @@ def logout():
 @admin_or_moderator_required
 def pending_users():
     """Lista de usuários pendentes de aprovação"""
-    pending = User.query.filter_by(is_approved=False).order_by(User.created_at.desc()).all()
+    pending = User.list_query().filter_by(is_approved=False).order_by(User.created_at.desc()).all()
     return render_template('auth/pending.html', pending_users=pending)
 
 
@@ -190,17 +221,24 @@ def pending_users():
 @admin_or_moderator_required
 def approve_user(user_id):
     """Aprovar usuário pendente"""
-    user = User.query.get_or_404(user_id)
+    user = current_app.extensions['sqlalchemy'].get_or_404(User, user_id)
 
     if user.is_approved:
         flash('Este usuário já foi aprovado.', 'warning')
         return redirect(url_for('auth.pending_users'))
 
-    # Aprovar usuário
-    user.is_approved = True
-    current_app.extensions['sqlalchemy'].session.commit()
+    # Nome lido antes do commit (depois dele o objeto expira e seria recarregado)
+    user_name = user.full_name
+
+    try:
+        user.approve()
+        current_app.extensions['sqlalchemy'].session.commit()
+        flash(f'Usuário {user_name} aprovado com sucesso!', 'success')
+    except Exception:
+        current_app.extensions['sqlalchemy'].session.rollback()
+        flash('Erro ao aprovar usuário.', 'error')
+        current_app.logger.exception("Erro ao aprovar usuário")
 
-    flash(f'Usuário {user.full_name} aprovado com sucesso!', 'success')
     return redirect(url_for('auth.pending_users'))
 
 
@@ -209,7 +247,7 @@ def approve_user(user_id):
 @admin_or_moderator_required
 def reject_user(user_id):
     """Rejeitar e remover usuário pendente"""
-    user = User.query.get_or_404(user_id)
+    user = current_app.extensions['sqlalchemy'].get_or_404(User, user_id)
 
     if user.is_approved:
         flash('Não é possível rejeitar usuário já aprovado.', 'error')
@@ -244,13 +282,8 @@ def bulk_approve():
         # Converter para inteiros
         user_ids = [int(uid) for uid in user_ids]
 
-        # Aprovar usuários selecionados
-        users = User.query.filter(User.id.in_(user_ids), User.is_approved == False).all()
-
-        approved_count = 0
-        for user in users:
-            user.is_approved = True
-            approved_count += 1
+        # Aprovar usuários selecionados (UPDATE em lote, sem carregar os usuários)
+        approved_count = User.approve_many(user_ids)
 
         current_app.extensions['sqlalchemy'].session.commit()
 
@@ -275,10 +308,12 @@ def check_username():
     if len(username) < 3:
         return jsonify({'available': False, 'message': 'Username muito curto'})
 
-    if not re.match(r'^[a-zA-Z0-9_]+$', username):
+    if not USERNAME_RE.match(username):
         return jsonify({'available': False, 'message': 'Username inválido'})
 
-    exists = User.query.filter_by(username=username).first() is not None
+    # EXISTS: o banco responde só um booleano (usa o índice único de username)
+    db = current_app.extensions['sqlalchemy']
+    exists = db.session.query(User.query.filter_by(username=username).exists()).scalar()
 
     return jsonify({
         'available': not exists,
@@ -297,7 +332,8 @@ def check_email():
     if not validate_email(email):
         return jsonify({'available': False, 'message': 'Formato de email inválido'})
 
-    exists = User.query.filter_by(email=email).first() is not None
+    db = current_app.extensions['sqlalchemy']
+    exists = db.session.query(User.query.filter_by(email=email).exists()).scalar()
 
     return jsonify({
         'available': not exists,
@@ -336,6 +372,6 @@ def inject_auth_data():
 
     # Se usuário logado tem permissão para ver pendentes
     if current_user.is_authenticated and (current_user.is_admin or current_user.is_moderator):
-        data['pending_users_count'] = User.query.filter_by(is_approved=False).count()
+        data['pending_users_count'] = User.pending_count()
 
     return data
@@ -12,17 +12,94 @@ Responsável por:
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import func, desc
+from sqlalchemy import case, func, desc, select
+from sqlalchemy.orm import contains_eager, selectinload
 from models.user import User, QuizResult
 from models.quiz import Quiz
-from models.question import Question
+from models.loaders import strict
 from utils.decorators import admin_required, admin_or_moderator_required, approved_user_required
 from utils.helpers import format_datetime, format_time_ago
 from datetime import datetime, timedelta
+from threading import Lock
+from cachetools import TTLCache, cached
 
 # Criar blueprint para rotas de dashboard
 dashboard = Blueprint('dashboard', __name__)
 
+# Números gerais do sistema mudam devagar: cada processo guarda por 30 s
+_stats_cache = TTLCache(maxsize=8, ttl=30)
+_stats_lock = Lock()
+
+
+@cached(_stats_cache, key=lambda: 'admin', lock=_stats_lock)
+def _admin_stats():
+    """Contagens do painel do admin: uma consulta agregada por tabela"""
+    db = current_app.extensions['sqlalchemy']
+    user_counts = (db.session.query(
+        func.count(User.id).label('total_users'),
+        func.count(case((User.is_approved.is_(False), 1))).label('pending_users'),
+        func.count(case((User.user_type == 'admin', 1))).label('admins'),
+        func.count(case((User.user_type == 'moderator', 1))).label('moderators'),
+        func.count(case((User.user_type == 'student', 1))).label('students'))
+        .one())
+    quiz_counts = (db.session.query(
+        func.count(Quiz.id).label('total_quizzes'),
+        func.count(case((Quiz.status == 'active', 1))).label('active_quizzes'),
+        func.count(case((Quiz.status == 'archived', 1))).label('archived_quizzes'),
+        func.count(case((Quiz.status == 'deleted', 1))).label('deleted_quizzes'),
+        func.coalesce(func.sum(Quiz.question_count), 0).label('total_questions'),
+        select(func.count(QuizResult.id)).scalar_subquery().label('total_quiz_plays'))
+        .one())
+    return {**user_counts._asdict(), **quiz_counts._asdict()}
+
+
+@cached(_stats_cache, key=lambda: 'recent', lock=_stats_lock)
+def _recent_stats():
+    """Novos usuários, quizzes e jogadas dos últimos 30 dias (uma consulta)"""
+    db = current_app.extensions['sqlalchemy']
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    return db.session.query(
+        select(func.count(User.id)).where(User.created_at >= thirty_days_ago)
+        .scalar_subquery().label('new_users'),
+        select(func.count(Quiz.id)).where(Quiz.created_at >= thirty_days_ago)
+        .scalar_subquery().label('new_quizzes'),
+        select(func.count(QuizResult.id)).where(QuizResult.completed_at >= thirty_days_ago)
+        .scalar_subquery().label('quiz_plays')
+    ).one()._asdict()
+
+
+@cached(_stats_cache, key=lambda: 'ranking', lock=_stats_lock)
+def _student_ranking():
+    """
+    Posição de cada aluno aprovado que já jogou, calculada de uma vez com
+    RANK() OVER (empates dividem a posição), e o total de alunos. A ordem usa a
+    mesma média ponderada exibida no painel (User.average_percentage), a partir
+    dos totais desnormalizados do usuário
+    """
+    db = current_app.extensions['sqlalchemy']
+    percentage = User.score_total * 100.0 / User.questions_answered
+    position = func.rank().over(order_by=percentage.desc())
+    rows = (db.session.query(User.id, position)
+            .filter(User.user_type == 'student',
+                    User.is_approved.is_(True),
+                    User.questions_answered > 0)
+            .all())
+    total_students = User.query.filter_by(user_type='student', is_approved=True).count()
+    return {'positions': dict(rows), 'total_students': total_students}
+
+
+@cached(_stats_cache, key=lambda: 'moderator', lock=_stats_lock)
+def _moderator_system_stats():
+    """Números gerais mostrados ao moderador (uma consulta)"""
+    db = current_app.extensions['sqlalchemy']
+    return db.session.query(
+        select(func.count(User.id)).where(User.is_approved.is_(True))
+        .scalar_subquery().label('total_users'),
+        select(func.count(Quiz.id)).where(Quiz.status == 'active')
+        .scalar_subquery().label('total_quizzes'),
+        select(func.count(QuizResult.id)).scalar_subquery().label('total_plays')
+    ).one()._asdict()
+
 
 @dashboard.route('/')
 @login_required
@@ -46,23 +123,10 @@ def index():
 @admin_required
 def admin():
     """Dashboard do administrador"""
-    db = current_app.extensions['sqlalchemy']
 
-    # Estatísticas gerais do sistema
+    # Estatísticas gerais do sistema (em cache por alguns segundos)
     try:
-        stats = {
-            'total_users': User.query.count(),
-            'pending_users': User.query.filter_by(is_approved=False).count(),
-            'admins': User.query.filter_by(user_type='admin').count(),
-            'moderators': User.query.filter_by(user_type='moderator').count(),
-            'students': User.query.filter_by(user_type='student').count(),
-            'total_quizzes': Quiz.query.count(),
-            'active_quizzes': Quiz.query.filter_by(status='active').count(),
-            'archived_quizzes': Quiz.query.filter_by(status='archived').count(),
-            'deleted_quizzes': Quiz.query.filter_by(status='deleted').count(),
-            'total_questions': Question.query.count(),
-            'total_quiz_plays': QuizResult.query.count()
-        }
+        stats = _admin_stats()
     except Exception as e:
         current_app.logger.error(f"Erro ao buscar estatísticas: {e}")
         stats = {
@@ -74,17 +138,20 @@ def admin():
 
     # Usuários recentes (últimos 10)
     try:
-        recent_users = User.query.order_by(desc(User.created_at)).limit(10).all()
+        recent_users = User.list_query().order_by(desc(User.created_at)).limit(10).all()
     except Exception:
         recent_users = []
 
     # Quizzes populares (mais jogados)
     try:
-        popular_quizzes = (db.session.query(Quiz, func.count(QuizResult.id).label('play_count'))
-                           .join(QuizResult, Quiz.id == QuizResult.quiz_id)
-                           .filter(Quiz.status == 'active')
-                           .group_by(Quiz.id)
-                           .order_by(desc('play_count'))
+        # Contador desnormalizado (Quiz.total_attempts) em vez de agregar
+        # quiz_results; percorre o índice parcial ix_quizzes_listable_attempts
+        popular_quizzes = (Quiz.active_query()
+                           .add_columns(Quiz.total_attempts.label('play_count'))
+                           .options(selectinload(Quiz.creator))
+                           .filter(Quiz.total_attempts > 0)
+                           .order_by(None)
+                           .order_by(Quiz.total_attempts.desc())
                            .limit(5)
                            .all())
     except Exception:
@@ -92,7 +159,7 @@ def admin():
 
     # Usuários pendentes de aprovação
     try:
-        pending_users = User.query.filter_by(is_approved=False).order_by(User.created_at.desc()).limit(5).all()
+        pending_users = User.list_query().filter_by(is_approved=False).order_by(User.created_at.desc()).limit(5).all()
     except Exception:
         pending_users = []
 
@@ -101,6 +168,7 @@ def admin():
         recent_activity = (QuizResult.query
                            .join(User, QuizResult.user_id == User.id)
                            .join(Quiz, QuizResult.quiz_id == Quiz.id)
+                           .options(*strict(contains_eager(QuizResult.user), contains_eager(QuizResult.quiz)))
                            .order_by(desc(QuizResult.completed_at))
                            .limit(10)
                            .all())
@@ -108,13 +176,8 @@ def admin():
         recent_activity = []
 
     # Estatísticas por período (últimos 30 dias)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
     try:
-        recent_stats = {
-            'new_users': User.query.filter(User.created_at >= thirty_days_ago).count(),
-            'new_quizzes': Quiz.query.filter(Quiz.created_at >= thirty_days_ago).count(),
-            'quiz_plays': QuizResult.query.filter(QuizResult.completed_at >= thirty_days_ago).count()
-        }
+        recent_stats = _recent_stats()
     except Exception:
         recent_stats = {'new_users': 0, 'new_quizzes': 0, 'quiz_plays': 0}
 
@@ -132,30 +195,46 @@ def admin():
 @admin_or_moderator_required
 def moderator():
     """Dashboard do moderador"""
+    db = current_app.extensions['sqlalchemy']
 
-    # Estatísticas pessoais
+    # Estatísticas pessoais: uma linha agregada sobre os contadores dos quizzes
     try:
-        my_quizzes = Quiz.query.filter_by(created_by=current_user.id).all()
+        my_quizzes_count, active_quizzes, total_plays, total_questions = (
+            db.session.query(func.count(Quiz.id),
+                             func.count(case((Quiz.status == 'active', 1))),
+                             func.coalesce(func.sum(Quiz.total_attempts), 0),
+                             func.coalesce(func.sum(Quiz.question_count), 0))
+            .filter(Quiz.created_by == current_user.id)
+            .one()
+        )
     except Exception:
-        my_quizzes = []
+        my_quizzes_count = active_quizzes = total_plays = total_questions = 0
 
     stats = {
-        'my_quizzes_count': len(my_quizzes),
-        'active_quizzes': len([q for q in my_quizzes if q.status == 'active']),
-        'total_plays': sum(len(q.get_results()) for q in my_quizzes),
-        'total_questions': sum(len(q.get_questions()) for q in my_quizzes),
-        'pending_users': User.query.filter_by(is_approved=False).count() if current_user.can_approve_users else 0
+        'my_quizzes_count': my_quizzes_count,
+        'active_quizzes': active_quizzes,
+        'total_plays': total_plays,
+        'total_questions': total_questions,
+        'pending_users': User.pending_count() if current_user.can_approve_users else 0
     }
 
     # Meus quizzes mais populares
     try:
-        my_popular_quizzes = sorted(my_quizzes, key=lambda q: len(q.get_results()), reverse=True)[:5]
+        my_popular_quizzes = (Quiz.list_query()
+                              .filter_by(created_by=current_user.id)
+                              .order_by(desc(Quiz.total_attempts))
+                              .limit(5)
+                              .all())
     except Exception:
         my_popular_quizzes = []
 
     # Quizzes recentes que criei
     try:
-        recent_quizzes = Quiz.query.filter_by(created_by=current_user.id).order_by(desc(Quiz.created_at)).limit(5).all()
+        recent_quizzes = (Quiz.list_query()
+                          .filter_by(created_by=current_user.id)
+                          .order_by(desc(Quiz.created_at))
+                          .limit(5)
+                          .all())
     except Exception:
         recent_quizzes = []
 
@@ -165,6 +244,7 @@ def moderator():
                           .join(Quiz, QuizResult.quiz_id == Quiz.id)
                           .filter(Quiz.created_by == current_user.id)
                           .join(User, QuizResult.user_id == User.id)
+                          .options(*strict(contains_eager(QuizResult.user), contains_eager(QuizResult.quiz)))
                           .order_by(desc(QuizResult.completed_at))
                           .limit(10)
                           .all())
@@ -175,11 +255,7 @@ def moderator():
     system_stats = None
     if current_user.is_moderator:
         try:
-            system_stats = {
-                'total_users': User.query.filter_by(is_approved=True).count(),
-                'total_quizzes': Quiz.query.filter_by(status='active').count(),
-                'total_plays': QuizResult.query.count()
-            }
+            system_stats = _moderator_system_stats()
         except Exception:
             system_stats = {'total_users': 0, 'total_quizzes': 0, 'total_plays': 0}
 
@@ -196,43 +272,20 @@ def moderator():
 @approved_user_required
 def student():
     """Dashboard do aluno"""
-    db = current_app.extensions['sqlalchemy']
-
-    # Estatísticas pessoais
-    try:
-        my_results = QuizResult.query.filter_by(user_id=current_user.id).all()
-    except Exception:
-        my_results = []
-
-    if my_results:
-        total_score = sum(r.score for r in my_results)
-        total_questions = sum(r.total_questions for r in my_results)
-        average_percentage = (total_score / total_questions * 100) if total_questions > 0 else 0
-        best_score = max(r.percentage_score for r in my_results)
 
-        stats = {
-            'quizzes_played': len(my_results),
-            'total_questions_answered': total_questions,
-            'average_score': round(average_percentage, 1),
-            'best_score': round(best_score, 1),
-            'total_time_spent': sum(r.time_spent or 0 for r in my_results)
-        }
-    else:
-        stats = {
-            'quizzes_played': 0,
-            'total_questions_answered': 0,
-            'average_score': 0,
-            'best_score': 0,
-            'total_time_spent': 0
-        }
+    # Estatísticas pessoais (totais já mantidos na própria linha do usuário)
+    has_played = current_user.quizzes_played > 0
+    stats = {
+        'quizzes_played': current_user.quizzes_played,
+        'total_questions_answered': current_user.questions_answered,
+        'average_score': round(current_user.average_percentage, 1),
+        'best_score': round(current_user.best_percentage, 1),
+        'total_time_spent': current_user.time_spent_total
+    }
 
     # Quizzes disponíveis para jogar
     try:
-        available_quizzes = (Quiz.query
-                             .filter_by(status='active', is_public=True)
-                             .order_by(desc(Quiz.created_at))
-                             .limit(10)
-                             .all())
+        available_quizzes = Quiz.available_listing(limit=10)
     except Exception:
         available_quizzes = []
 
@@ -241,6 +294,7 @@ def student():
         recent_results = (QuizResult.query
                           .filter_by(user_id=current_user.id)
                           .join(Quiz, QuizResult.quiz_id == Quiz.id)
+                          .options(*strict(contains_eager(QuizResult.quiz)))
                           .order_by(desc(QuizResult.completed_at))
                           .limit(5)
                           .all())
@@ -249,29 +303,21 @@ def student():
 
     # Quizzes recomendados (baseado em dificuldade e performance)
     recommended_quizzes = []
-    if my_results:
+    if has_played:
         try:
             # Recomendar quizzes com dificuldade similar ao desempenho do usuário
+            # (pela média geral de cada quiz, coluna average_score; sem agregar quiz_results)
             avg_performance = stats['average_score']
-            if avg_performance >= 80:
-                # Usuário bom - recomendar quizzes mais difíceis
-                recommended_quizzes = (Quiz.query
-                                       .filter_by(status='active', is_public=True)
-                                       .outerjoin(QuizResult)
-                                       .group_by(Quiz.id)
-                                       .having(func.avg(QuizResult.score * 100 / QuizResult.total_questions) < 70)
-                                       .limit(3)
-                                       .all())
-            elif avg_performance >= 60:
+            if 60 <= avg_performance < 80:
                 # Usuário médio - recomendar quizzes médios
                 recommended_quizzes = available_quizzes[:3]
             else:
-                # Usuário iniciante - recomendar quizzes mais fáceis
-                recommended_quizzes = (Quiz.query
-                                       .filter_by(status='active', is_public=True)
-                                       .outerjoin(QuizResult)
-                                       .group_by(Quiz.id)
-                                       .having(func.avg(QuizResult.score * 100 / QuizResult.total_questions) > 70)
+                # Usuário bom - quizzes mais difíceis (média geral < 70);
+                # usuário iniciante - quizzes mais fáceis (média geral > 70)
+                difficulty = (Quiz.average_score < 70 if avg_performance >= 80
+                              else Quiz.average_score > 70)
+                recommended_quizzes = (Quiz.active_query()
+                                       .filter(Quiz.total_attempts > 0, difficulty)
                                        .limit(3)
                                        .all())
         except Exception:
@@ -284,15 +330,10 @@ def student():
     ranking_position = None
     total_students = 0
     try:
-        if my_results:
-            user_avg = stats['average_score']
-            better_users = (db.session.query(func.count(User.id))
-                            .join(QuizResult)
-                            .group_by(User.id)
-                            .having(func.avg(QuizResult.score * 100 / QuizResult.total_questions) > user_avg)
-                            .count())
-            ranking_position = better_users + 1
-        total_students = User.query.filter_by(user_type='student', is_approved=True).count()
+        ranking = _student_ranking()
+        if has_played:
+            ranking_position = ranking['positions'].get(current_user.id)
+        total_students = ranking['total_students']
     except Exception:
         ranking_position = None
         total_students = 0
@@ -306,49 +347,63 @@ def student():
                            total_students=total_students)
 
 
+def _last_days(count):
+    """Início (meia-noite UTC) de hoje e dos dias anteriores, do mais recente ao mais antigo"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [today - timedelta(days=i) for i in range(count)]
+
+
+def _count_per_day(db, column, start):
+    """{'AAAA-MM-DD': total} das linhas com column >= start, agrupadas por dia no banco"""
+    day = func.date(column)
+    rows = (db.session.query(day, func.count())
+            .filter(column >= start)
+            .group_by(day)
+            .all())
+    # func.date devolve date no PostgreSQL e texto no SQLite
+    return {str(row_day): count for row_day, count in rows}
+
+
 @dashboard.route('/api/chart-data/<chart_type>')
 @login_required
 @approved_user_required
 def chart_data(chart_type):
     """API para dados de gráficos"""
+    db = current_app.extensions['sqlalchemy']
 
     if chart_type == 'user_growth':
-        # Crescimento de usuários nos últimos 30 dias
+        # Crescimento de usuários nos últimos 30 dias (total acumulado ao fim de cada dia):
+        # um COUNT do que veio antes + um GROUP BY por dia, somados em Python
+        days = _last_days(30)
+        start = days[-1]
+        running = User.query.filter(User.created_at < start).count()
+        per_day = _count_per_day(db, User.created_at, start)
+
         data = []
-        for i in range(30):
-            date = datetime.utcnow() - timedelta(days=i)
-            count = User.query.filter(User.created_at <= date).count()
-            data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'count': count
-            })
+        for day in reversed(days):
+            running += per_day.get(day.strftime('%Y-%m-%d'), 0)
+            data.append({'date': day.strftime('%Y-%m-%d'), 'count': running})
+        data.reverse()
         return jsonify(data)
 
     elif chart_type == 'quiz_plays':
-        # Jogos de quiz nos últimos 7 dias
-        data = []
-        for i in range(7):
-            date = datetime.utcnow() - timedelta(days=i)
-            start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_of_day = start_of_day + timedelta(days=1)
-
-            count = QuizResult.query.filter(
-                QuizResult.completed_at >= start_of_day,
-                QuizResult.completed_at < end_of_day
-            ).count()
-
-            data.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'count': count
-            })
+        # Jogos de quiz nos últimos 7 dias (um GROUP BY por dia; dias sem jogos = 0)
+        days = _last_days(7)
+        per_day = _count_per_day(db, QuizResult.completed_at, days[-1])
+
+        data = [{'date': day.strftime('%Y-%m-%d'), 'count': per_day.get(day.strftime('%Y-%m-%d'), 0)}
+                for day in days]
         return jsonify(data)
 
     elif chart_type == 'user_types':
         # Distribuição de tipos de usuário
+        counts = dict(db.session.query(User.user_type, func.count(User.id))
+                      .group_by(User.user_type)
+                      .all())
         data = [
-            {'type': 'Administradores', 'count': User.query.filter_by(user_type='admin').count()},
-            {'type': 'Moderadores', 'count': User.query.filter_by(user_type='moderator').count()},
-            {'type': 'Alunos', 'count': User.query.filter_by(user_type='student').count()}
+            {'type': 'Administradores', 'count': counts.get('admin', 0)},
+            {'type': 'Moderadores', 'count': counts.get('moderator', 0)},
+            {'type': 'Alunos', 'count': counts.get('student', 0)}
         ]
         return jsonify(data)
 
@@ -367,8 +422,9 @@ def search():
 
     # Buscar quizzes
     try:
+        # ILIKE '%termo%' (sem diferenciar maiúsculas); no PostgreSQL usa o índice trigram
         quizzes = Quiz.query.filter(
-            Quiz.title.contains(query),
+            Quiz.title.icontains(query, autoescape=True),
             Quiz.status == 'active'
         ).limit(10).all()
     except Exception:
@@ -378,10 +434,10 @@ def search():
     users = []
     if current_user.is_admin:
         try:
-            users = User.query.filter(
-                (User.username.contains(query)) |
-                (User.first_name.contains(query)) |
-                (User.last_name.contains(query))
+            users = User.list_query().filter(
+                (User.username.icontains(query, autoescape=True)) |
+                (User.first_name.icontains(query, autoescape=True)) |
+                (User.last_name.icontains(query, autoescape=True))
             ).limit(10).all()
         except Exception:
             users = []
@@ -11,10 +11,13 @@ Responsável por:
 """
 
 import os
-import json
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, current_app
+import hashlib
+import orjson
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, current_app, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload, lazyload
+from app import db
 from models.user import User, QuizResult
 from models.quiz import Quiz
 from models.question import Question
@@ -39,86 +42,87 @@ def create():
         return render_template('quiz/create.html')
     
     try:
-        db = current_app.extensions['sqlalchemy']
-        print("=== DEBUG: Iniciando criação de quiz ===")
-        
         # Pegar dados básicos do formulário
         title = request.form.get('title', '').strip()
         description = request.form.get('description', '').strip()
         questions_json = request.form.get('questions_data', '')
         
-        print(f"DEBUG: title='{title}'")
-        print(f"DEBUG: description='{description}'")
-        print(f"DEBUG: questions_json presente: {bool(questions_json)}")
-        
         # Validar título obrigatório
         if not title:
-            print("DEBUG: Erro - título vazio")
             flash('Título é obrigatório.', 'error')
             return render_template('quiz/create.html')
         
         if not questions_json:
-            print("DEBUG: Erro - nenhuma questão fornecida")
             flash('Adicione pelo menos uma questão ao quiz.', 'error')
             return render_template('quiz/create.html')
         
         # Parse das questões
         try:
-            questions_data = json.loads(questions_json)
-            print(f"DEBUG: questions_data parsed: {len(questions_data)} questões")
-            
-            # Debug: mostrar estrutura das questões
-            for i, q in enumerate(questions_data):
-                print(f"DEBUG: Questão {i+1}: question='{q.get('question', '')[:50]}...', answers={len(q.get('answers', []))}")
-                
-        except json.JSONDecodeError as e:
-            print(f"DEBUG: Erro JSON decode: {e}")
+            questions_data = orjson.loads(questions_json)
+        except orjson.JSONDecodeError as e:
+            current_app.logger.debug("JSON das questões inválido: %s", e)
             flash('Erro no formato das questões.', 'error')
             return render_template('quiz/create.html')
         
-        # Validar questões básica
-        valid_questions = []
+        # Validar e montar as linhas das questões numa única passada
+        # (antes de qualquer escrita no banco)
+        question_rows = []
         for i, question_data in enumerate(questions_data):
             question_text = question_data.get('question', '').strip()
             answers = question_data.get('answers', [])
             
             if not question_text:
-                print(f"DEBUG: Questão {i+1} sem texto")
+                current_app.logger.debug("Questão %s sem texto", i + 1)
                 continue
                 
             if len(answers) < 2:
-                print(f"DEBUG: Questão {i+1} precisa de pelo menos 2 respostas")
+                current_app.logger.debug("Questão %s precisa de pelo menos 2 respostas", i + 1)
                 continue
+            
+            # Separar resposta correta das incorretas
+            correct_answer = None
+            wrong_answers = []
+            
+            for answer in answers:
+                answer_text = answer.get('text', '').strip()
+                is_correct = answer.get('isCorrect', False)
                 
-            # Verificar se tem resposta correta
-            has_correct = any(answer.get('isCorrect', False) for answer in answers)
-            if not has_correct:
-                print(f"DEBUG: Questão {i+1} sem resposta correta")
+                if not answer_text:
+                    continue
+                    
+                if is_correct and not correct_answer:
+                    correct_answer = answer_text
+                elif not is_correct:
+                    wrong_answers.append(answer_text)
+            
+            # Verificar se tem resposta correta (com texto)
+            if not correct_answer:
+                current_app.logger.debug("Questão %s sem resposta correta", i + 1)
                 continue
-                
-            valid_questions.append(question_data)
-            print(f"DEBUG: Questão {i+1} válida")
+            
+            # Questão no formato do modelo existente
+            question_rows.append({
+                'question_text': question_text,
+                'correct_answer': correct_answer,
+                'option_a': wrong_answers[0] if len(wrong_answers) > 0 else None,
+                'option_b': wrong_answers[1] if len(wrong_answers) > 1 else None,
+                'option_c': wrong_answers[2] if len(wrong_answers) > 2 else None,
+                'order_index': len(question_rows)
+            })
         
-        if not valid_questions:
-            print("DEBUG: Nenhuma questão válida encontrada")
+        if not question_rows:
             flash('Nenhuma questão válida encontrada.', 'error')
             return render_template('quiz/create.html')
         
-        print(f"DEBUG: {len(valid_questions)} questões válidas processadas")
-        
         # Processar imagem do quiz
         image_filename = None
         if 'quiz_image' in request.files:
             file = request.files['quiz_image']
             if file and file.filename:
-                print("DEBUG: Processando imagem do quiz")
                 image_filename = save_uploaded_file(file)
                 if not image_filename:
-                    print("DEBUG: Erro ao salvar imagem do quiz")
                     flash('Erro ao fazer upload da imagem.', 'warning')
         
-        print("DEBUG: Criando objeto Quiz...")
-        
         # Criar quiz
         new_quiz = Quiz(
             title=title,
@@ -127,72 +131,25 @@ def create():
             image_filename=image_filename
         )
         
-        print("DEBUG: Adicionando quiz à sessão do banco...")
         db.session.add(new_quiz)
-        db.session.flush()  # Para obter o ID
-        
-        print(f"DEBUG: Quiz criado com ID: {new_quiz.id}")
+        db.session.flush()  # Único flush: o ID do quiz é necessário para as questões
         
-        # Processar cada questão válida
-        for i, question_data in enumerate(valid_questions):
-            print(f"DEBUG: Processando questão {i+1} de {len(valid_questions)}")
-            
-            question_text = question_data.get('question', '').strip()
-            answers = question_data.get('answers', [])
-            
-            # Separar resposta correta das incorretas
-            correct_answer = None
-            wrong_answers = []
-            
-            for answer in answers:
-                answer_text = answer.get('text', '').strip()
-                is_correct = answer.get('isCorrect', False)
-                
-                if not answer_text:
-                    continue
-                    
-                if is_correct and not correct_answer:
-                    correct_answer = answer_text
-                    print(f"DEBUG: Resposta correta: {answer_text[:30]}...")
-                elif not is_correct:
-                    wrong_answers.append(answer_text)
-                    print(f"DEBUG: Resposta incorreta: {answer_text[:30]}...")
-            
-            if not correct_answer:
-                print(f"DEBUG: ERRO - Questão {i+1} sem resposta correta válida")
-                continue
-            
-            # Criar questão no formato do modelo existente
-            new_question = Question(
-                quiz_id=new_quiz.id,
-                question_text=question_text,
-                correct_answer=correct_answer,
-                option_a=wrong_answers[0] if len(wrong_answers) > 0 else None,
-                option_b=wrong_answers[1] if len(wrong_answers) > 1 else None,
-                option_c=wrong_answers[2] if len(wrong_answers) > 2 else None,
-                order_index=i
-            )
-            
-            db.session.add(new_question)
-            print(f"DEBUG: Questão {i+1} adicionada: {len(wrong_answers)} alternativas incorretas")
+        # Um único INSERT em lote para todas as questões
+        Question.insert_many(new_quiz, question_rows)
         
         # COMMIT FINAL - CRUCIAL PARA SALVAR
-        print("DEBUG: Fazendo commit final...")
         db.session.commit()
-        print("DEBUG: ✅ Quiz e questões salvos com SUCESSO!")
+        current_app.logger.debug("Quiz %s criado com %s questões", new_quiz.id, len(question_rows))
         
         flash('Quiz criado com sucesso!', 'success')
         return redirect(url_for('dashboard.index'))
         
     except Exception as e:
-        print(f"DEBUG: 💥 ERRO COMPLETO: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        current_app.logger.exception("Erro ao criar quiz")
         
         # Rollback em caso de erro
         try:
             db.session.rollback()
-            print("DEBUG: Rollback realizado")
         except:
             pass
             
@@ -205,11 +162,9 @@ def create():
 @quiz_owner_or_admin_required
 def edit(quiz_id):
     """Editar quiz existente"""
-    quiz_obj = Quiz.query.get_or_404(quiz_id)
+    quiz_obj = db.get_or_404(Quiz, quiz_id)
     
     if request.method == 'POST':
-        db = current_app.extensions['sqlalchemy']
-        
         # Atualizar informações básicas
         title = request.form.get('title', '').strip()
         description = request.form.get('description', '').strip()
@@ -221,7 +176,6 @@ def edit(quiz_id):
         try:
             quiz_obj.title = title
             quiz_obj.description = description
-            quiz_obj.updated_at = datetime.utcnow()
             
             # Processar nova imagem se enviada
             if 'quiz_image' in request.files:
@@ -241,10 +195,10 @@ def edit(quiz_id):
             db.session.commit()
             flash('Quiz atualizado com sucesso!', 'success')
             
-        except Exception as e:
+        except Exception:
             db.session.rollback()
             flash('Erro ao atualizar quiz.', 'error')
-            print(f"Erro ao atualizar quiz: {e}")
+            current_app.logger.exception("Erro ao atualizar quiz")
     
     return render_template('quiz/edit.html', quiz=quiz_obj)
 
@@ -254,9 +208,7 @@ def edit(quiz_id):
 @admin_or_moderator_required
 def delete_question(question_id):
     """Excluir questão"""
-    db = current_app.extensions['sqlalchemy']
-    
-    question = Question.query.get_or_404(question_id)
+    question = db.get_or_404(Question, question_id)
     quiz_obj = question.quiz
     
     # Verificar permissão
@@ -270,14 +222,43 @@ def delete_question(question_id):
             delete_file(question.image_filename)
         
         db.session.delete(question)
+
+        # Fechar o buraco deixado na ordem das questões restantes
+        Question.update_order_in_quiz(quiz_obj.id)
         db.session.commit()
         
         flash('Questão excluída com sucesso!', 'success')
         
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         flash('Erro ao excluir questão.', 'error')
-        print(f"Erro ao excluir questão: {e}")
+        current_app.logger.exception("Erro ao excluir questão")
+    
+    return redirect(url_for('quiz.edit', quiz_id=quiz_obj.id))
+
+
+@quiz.route('/move_question/<int:question_id>/<any(up, down):direction>', methods=['POST'])
+@login_required
+@admin_or_moderator_required
+def move_question(question_id, direction):
+    """Mover questão para cima ou para baixo (um único commit para a troca)"""
+    question = db.get_or_404(Question, question_id)
+    quiz_obj = question.quiz
+    
+    # Verificar permissão
+    if not (current_user.is_admin or quiz_obj.created_by == current_user.id):
+        flash('Você não tem permissão para reordenar esta questão.', 'error')
+        return redirect(url_for('dashboard.index'))
+    
+    try:
+        moved = question.move_up() if direction == 'up' else question.move_down()
+        db.session.commit()
+        if not moved:
+            flash('A questão já está nessa posição.', 'info')
+    except Exception:
+        db.session.rollback()
+        flash('Erro ao mover questão.', 'error')
+        current_app.logger.exception("Erro ao mover questão")
     
     return redirect(url_for('quiz.edit', quiz_id=quiz_obj.id))
 
@@ -291,8 +272,9 @@ def manage():
     status_filter = request.args.get('status', 'active')
     search = request.args.get('search', '')
     
-    # Query base - quizzes do usuário atual
-    query = Quiz.query.filter_by(created_by=current_user.id)
+    # Query base - quizzes do usuário atual (criador carregado junto; questões e
+    # jogadas vêm dos contadores question_count e total_attempts)
+    query = Quiz.manage_query().filter_by(created_by=current_user.id)
     
     # Aplicar filtros de status usando campos corretos
     if status_filter == 'active':
@@ -316,8 +298,8 @@ def manage():
             per_page=10,
             error_out=False
         )
-    except Exception as e:
-        print(f"Erro na paginação: {e}")
+    except Exception:
+        current_app.logger.exception("Erro na paginação")
         quizzes = query.limit(10).all()
     
     return render_template('quiz/manage.html',
@@ -331,7 +313,7 @@ def manage():
 @admin_or_moderator_required
 def archive(quiz_id):
     """Arquivar quiz"""
-    quiz_obj = Quiz.query.get_or_404(quiz_id)
+    quiz_obj = db.get_or_404(Quiz, quiz_id)
     
     # Verificar permissão
     if not (current_user.is_admin or quiz_obj.created_by == current_user.id):
@@ -339,17 +321,13 @@ def archive(quiz_id):
         return redirect(url_for('quiz.manage'))
     
     try:
-        db = current_app.extensions['sqlalchemy']
-        quiz_obj.is_archived = True
-        quiz_obj.is_active = False
-        quiz_obj.updated_at = datetime.utcnow()
+        quiz_obj.archive()
         db.session.commit()
-        
         flash('Quiz arquivado com sucesso!', 'success')
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         flash('Erro ao arquivar quiz.', 'error')
-        print(f"Erro ao arquivar quiz: {e}")
+        current_app.logger.exception("Erro ao arquivar quiz")
     
     return redirect(url_for('quiz.manage'))
 
@@ -358,20 +336,16 @@ def archive(quiz_id):
 @login_required
 def delete(quiz_id):
     """Excluir quiz (soft delete)"""
-    quiz_obj = Quiz.query.get_or_404(quiz_id)
+    quiz_obj = db.get_or_404(Quiz, quiz_id)
     
     try:
-        db = current_app.extensions['sqlalchemy']
-        quiz_obj.is_deleted = True
-        quiz_obj.is_active = False
-        quiz_obj.updated_at = datetime.utcnow()
+        quiz_obj.delete()
         db.session.commit()
-        
         flash('Quiz excluído com sucesso!', 'success')
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         flash('Erro ao excluir quiz.', 'error')
-        print(f"Erro ao excluir quiz: {e}")
+        current_app.logger.exception("Erro ao excluir quiz")
     
     return redirect(url_for('quiz.manage'))
 
@@ -380,7 +354,7 @@ def delete(quiz_id):
 @login_required
 def restore(quiz_id):
     """Restaurar quiz arquivado/excluído"""
-    quiz_obj = Quiz.query.get_or_404(quiz_id)
+    quiz_obj = db.get_or_404(Quiz, quiz_id)
     
     # Apenas admin pode restaurar
     if not current_user.is_admin:
@@ -388,27 +362,62 @@ def restore(quiz_id):
         return redirect(url_for('quiz.manage'))
     
     try:
-        db = current_app.extensions['sqlalchemy']
-        quiz_obj.is_deleted = False
-        quiz_obj.is_archived = False
-        quiz_obj.is_active = True
-        quiz_obj.updated_at = datetime.utcnow()
+        quiz_obj.restore()
         db.session.commit()
-        
         flash('Quiz restaurado com sucesso!', 'success')
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         flash('Erro ao restaurar quiz.', 'error')
-        print(f"Erro ao restaurar quiz: {e}")
+        current_app.logger.exception("Erro ao restaurar quiz")
     
     return redirect(url_for('quiz.manage'))
 
 
+@quiz.route('/bulk_status', methods=['POST'])
+@login_required
+@admin_or_moderator_required
+def bulk_status():
+    """Arquivar, excluir ou restaurar vários quizzes de uma vez via JSON"""
+    data = request.get_json(silent=True) or {}
+    status = data.get('status')
+    quiz_ids = data.get('quiz_ids', [])
+
+    if status not in ('archived', 'deleted', 'active') or not quiz_ids or not isinstance(quiz_ids, list):
+        return jsonify({'success': False, 'message': 'Ação ou seleção inválida'}), 400
+
+    # IDs validados antes de tocar no banco: valor não numérico é erro do cliente
+    try:
+        quiz_ids = [int(qid) for qid in quiz_ids]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Seleção inválida'}), 400
+
+    # Apenas admin pode restaurar
+    if status == 'active' and not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Apenas administradores podem restaurar quizzes'}), 403
+
+    try:
+        # Moderadores só alteram os próprios quizzes
+        if not current_user.is_admin:
+            quiz_ids = [row.id for row in (db.session.query(Quiz.id)
+                                           .filter(Quiz.id.in_(quiz_ids),
+                                                   Quiz.created_by == current_user.id))]
+
+        # Um UPDATE por lote e um único commit para toda a seleção
+        count = Quiz.bulk_set_status(quiz_ids, status)
+        db.session.commit()
+        return jsonify({'success': True, 'message': f'{count} quizzes processados'})
+
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Erro na ação em lote de quizzes")
+        return jsonify({'success': False, 'message': 'Erro ao processar ação'}), 500
+
+
 @quiz.route('/view/<int:quiz_id>')
 @login_required
 def view(quiz_id):
     """Visualizar detalhes do quiz"""
-    quiz_obj = Quiz.query.get_or_404(quiz_id)
+    quiz_obj = db.get_or_404(Quiz, quiz_id)
     
     # Verificar se pode visualizar
     if not (quiz_obj.can_be_played() or
@@ -417,14 +426,19 @@ def view(quiz_id):
         flash('Você não tem permissão para visualizar este quiz.', 'error')
         return redirect(url_for('dashboard.index'))
     
-    # Estatísticas do quiz
+    # Estatísticas do quiz (uma única consulta agregada)
     stats = quiz_obj.get_completion_stats()
     
-    # Resultados recentes (se for criador ou admin)
+    # Resultados recentes (se for criador ou admin), já com o jogador no mesmo SELECT
     recent_results = []
     if current_user.is_admin or quiz_obj.created_by == current_user.id:
         try:
-            recent_results = QuizResult.query.filter_by(quiz_id=quiz_id).order_by(QuizResult.completed_at.desc()).limit(10).all()
+            recent_results = (QuizResult.query
+                              .options(joinedload(QuizResult.user))
+                              .filter_by(quiz_id=quiz_id)
+                              .order_by(QuizResult.completed_at.desc())
+                              .limit(10)
+                              .all())
         except:
             recent_results = []
     
@@ -434,31 +448,53 @@ def view(quiz_id):
                           recent_results=recent_results)
 
 
+@quiz.route('/<int:quiz_id>/questions')
+@login_required
+@quiz_owner_or_admin_required
+def list_questions(quiz_id):
+    """Listar questões do quiz em JSON (inclui as respostas, por isso só criador/admin)"""
+    # ?preview=1 devolve só o início de cada enunciado (listagens)
+    preview_only = request.args.get('preview') == '1'
+
+    response = jsonify({
+        'quiz_id': quiz_id,
+        'questions': Question.list_for_quiz(quiz_id, preview_only=preview_only)
+    })
+
+    # Conteúdo determinístico: o navegador revalida com If-None-Match e recebe 304
+    response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest())
+    return response.make_conditional(request)
+
+
 @quiz.route('/play/<int:quiz_id>')
 @login_required
 def play(quiz_id):
     """Iniciar jogo do quiz"""
-    quiz_obj = Quiz.query.get_or_404(quiz_id)
+    # As questões vêm por Question.play_rows; não carregar a coleção inteira aqui
+    quiz_obj = db.session.get(Quiz, quiz_id, options=[lazyload(Quiz.questions)]) or abort(404)
     
     # Verificar se pode ser jogado
     if not quiz_obj.can_be_played():
         flash('Este quiz não está disponível para jogar.', 'error')
         return redirect(url_for('dashboard.index'))
     
-    # Preparar questões com respostas embaralhadas
-    questions = quiz_obj.get_questions_for_play()
+    # Preparar questões com respostas embaralhadas (seed fixa por tentativa)
+    start_time = datetime.utcnow().isoformat()
+    questions = quiz_obj.get_questions_for_play(seed=f'{current_user.id}:{quiz_id}:{start_time}')
     
     if not questions:
         flash('Este quiz não possui questões.', 'warning')
         return redirect(url_for('dashboard.index'))
     
-    # Salvar estado do jogo na sessão
+    # Salvar estado do jogo na sessão (cookie assinado): só IDs e letras corretas,
+    # não as questões inteiras, para o cookie não crescer com o tamanho do quiz
     session[f'quiz_game_{quiz_id}'] = {
         'quiz_id': quiz_id,
-        'questions': questions,
+        'question_ids': [question['id'] for question in questions],
+        'correct_letters': ''.join(question['correct_letter'] for question in questions),
         'current_question': 0,
-        'user_answers': [],
-        'start_time': datetime.utcnow().isoformat(),
+        'user_answers': '',
+        'start_time': start_time,
         'score': 0
     }
     
@@ -474,32 +510,25 @@ def submit_answer(quiz_id):
     """Submeter resposta de uma questão"""
     game_key = f'quiz_game_{quiz_id}'
     
-    if game_key not in session:
+    game_data = session.get(game_key)
+    if game_data is None:
         return jsonify({'error': 'Jogo não encontrado'}), 404
     
-    game_data = session[game_key]
-    user_answer = request.json.get('answer', '').strip()
-    question_index = request.json.get('question_index', 0)
+    # Corpo JSON lido uma vez; a letra já normalizada para as comparações
+    data = request.get_json(silent=True) or {}
+    user_answer = str(data.get('answer', '')).strip().upper()
+    question_index = data.get('question_index', 0)
     
-    if question_index >= len(game_data['questions']):
+    total_questions = len(game_data['question_ids'])
+    if question_index >= total_questions:
         return jsonify({'error': 'Questão inválida'}), 400
     
-    # Verificar resposta
-    current_question = game_data['questions'][question_index]
-    is_correct = False
-    
-    # Encontrar a alternativa selecionada
-    for alternative in current_question['alternatives']:
-        if alternative['letter'] == user_answer.upper():
-            is_correct = alternative['is_correct']
-            break
-    
-    # Salvar resposta
-    game_data['user_answers'].append({
-        'question_id': current_question['id'],
-        'user_answer': user_answer,
-        'is_correct': is_correct
-    })
+    # Verificar resposta pela letra correta guardada na sessão
+    correct_letter = game_data['correct_letters'][question_index]
+    is_correct = user_answer == correct_letter
+    
+    # Salvar resposta (uma letra por questão respondida)
+    game_data['user_answers'] += user_answer[:1] or '-'
     
     if is_correct:
         game_data['score'] += 1
@@ -508,11 +537,11 @@ def submit_answer(quiz_id):
     session[game_key] = game_data
     
     # Verificar se é a última questão
-    is_last_question = question_index >= len(game_data['questions']) - 1
+    is_last_question = question_index >= total_questions - 1
     
     return jsonify({
         'is_correct': is_correct,
-        'correct_letter': current_question['correct_letter'],
+        'correct_letter': correct_letter,
         'is_last_question': is_last_question,
         'next_question_index': question_index + 1 if not is_last_question else None
     })
@@ -522,7 +551,6 @@ def submit_answer(quiz_id):
 @login_required
 def finish(quiz_id):
     """Finalizar quiz e salvar resultado"""
-    db = current_app.extensions['sqlalchemy']
     game_key = f'quiz_game_{quiz_id}'
     
     if game_key not in session:
@@ -530,7 +558,7 @@ def finish(quiz_id):
         return redirect(url_for('dashboard.index'))
     
     game_data = session[game_key]
-    quiz_obj = Quiz.query.get_or_404(quiz_id)
+    quiz_obj = db.get_or_404(Quiz, quiz_id)
     
     # Calcular tempo gasto
     start_time = datetime.fromisoformat(game_data['start_time'])
@@ -543,10 +571,11 @@ def finish(quiz_id):
             user_id=current_user.id,
             quiz_id=quiz_id,
             score=game_data['score'],
-            total_questions=len(game_data['questions']),
+            total_questions=len(game_data['question_ids']),
             time_spent=time_spent
         )
         
+        # Totais do jogador e do quiz são somados pelo evento after_insert de QuizResult
         db.session.add(result)
         db.session.commit()
         
@@ -556,10 +585,10 @@ def finish(quiz_id):
         flash('Quiz concluído! Resultado salvo com sucesso.', 'success')
         return redirect(url_for('quiz.result', result_id=result.id))
         
-    except Exception as e:
+    except Exception:
         db.session.rollback()
         flash('Erro ao salvar resultado.', 'error')
-        print(f"Erro ao salvar resultado: {e}")
+        current_app.logger.exception("Erro ao salvar resultado")
         return redirect(url_for('dashboard.index'))
 
 
@@ -567,7 +596,7 @@ def finish(quiz_id):
 @login_required
 def result(result_id):
     """Mostrar resultado do quiz"""
-    result = QuizResult.query.get_or_404(result_id)
+    result = db.get_or_404(QuizResult, result_id)
     
     # Verificar se é o dono do resultado ou admin
     if result.user_id != current_user.id and not current_user.is_admin:
@@ -12,12 +12,12 @@ Responsável por:
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, make_response
 from flask_login import login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from models.user import User, QuizResult
+from sqlalchemy import case, func
+from sqlalchemy.orm import contains_eager
+from models.user import User, QuizResult, USER_TYPE_DISPLAY
 from models.quiz import Quiz
 from utils.decorators import admin_required, check_user_permissions
-from utils.helpers import validate_email, validate_password
-import re
+from utils.helpers import validate_email, validate_password, PHONE_RE
 import csv
 from io import StringIO
 
@@ -42,6 +42,7 @@ def profile():
         recent_activity = (QuizResult.query
                            .filter_by(user_id=current_user.id)
                            .join(Quiz)
+                           .options(contains_eager(QuizResult.quiz))
                            .order_by(QuizResult.completed_at.desc())
                            .limit(5)
                            .all())
@@ -101,7 +102,7 @@ def edit_profile():
                     errors.append('Este email já está em uso.')
 
         # Validar telefone
-        if phone and not re.match(r'^[\d\s\-\(\)\+]+$', phone):
+        if phone and not PHONE_RE.match(phone):
             errors.append('Formato de telefone inválido.')
 
         # Validar nova senha (se fornecida)
@@ -128,7 +129,7 @@ def edit_profile():
 
             # Atualizar senha se fornecida
             if new_password:
-                current_user.password_hash = generate_password_hash(new_password)
+                current_user.set_password(new_password)
 
             db.session.commit()
             flash('Perfil atualizado com sucesso!', 'success')
@@ -153,8 +154,8 @@ def manage_users():
     status_filter = request.args.get('status', 'all')
     search_query = request.args.get('search', '').strip()
 
-    # Query base
-    query = User.query
+    # Query base (só as colunas exibidas na tabela)
+    query = User.list_query()
 
     # Aplicar filtros
     if user_type_filter != 'all':
@@ -178,14 +179,15 @@ def manage_users():
     # Ordenar por data de criação (mais recentes primeiro)
     users = query.order_by(User.created_at.desc()).all()
 
-    # Estatísticas
-    stats = {
-        'total_users': User.query.count(),
-        'admins': User.query.filter_by(user_type='admin').count(),
-        'moderators': User.query.filter_by(user_type='moderator').count(),
-        'students': User.query.filter_by(user_type='student').count(),
-        'pending': User.query.filter_by(is_approved=False).count()
-    }
+    # Estatísticas (uma única consulta com contagens condicionais)
+    db = current_app.extensions['sqlalchemy']
+    stats = (db.session.query(
+        func.count(User.id).label('total_users'),
+        func.count(case((User.user_type == 'admin', 1))).label('admins'),
+        func.count(case((User.user_type == 'moderator', 1))).label('moderators'),
+        func.count(case((User.user_type == 'student', 1))).label('students'),
+        func.count(case((User.is_approved.is_(False), 1))).label('pending'))
+        .one()._asdict())
 
     return render_template('user/manage_users.html',
                            users=users,
@@ -202,17 +204,20 @@ def promote_user(user_id):
     """Promover usuário (aluno -> moderador)"""
     db = current_app.extensions['sqlalchemy']
     
-    target_user = User.query.get_or_404(user_id)
+    target_user = db.get_or_404(User, user_id)
 
     if target_user.id == current_user.id:
         flash('Você não pode alterar seu próprio tipo de usuário.', 'error')
         return redirect(url_for('user.manage_users'))
 
+    # Nome lido antes do commit (depois dele o objeto expira e seria recarregado)
+    user_name = f'{target_user.first_name} {target_user.last_name}'
+
     if target_user.user_type == 'student':
         try:
             target_user.user_type = 'moderator'
             db.session.commit()
-            flash(f'{target_user.first_name} {target_user.last_name} promovido a moderador!', 'success')
+            flash(f'{user_name} promovido a moderador!', 'success')
         except Exception as e:
             db.session.rollback()
             flash('Erro ao promover usuário.', 'error')
@@ -230,17 +235,20 @@ def demote_user(user_id):
     """Rebaixar usuário (moderador -> aluno)"""
     db = current_app.extensions['sqlalchemy']
     
-    target_user = User.query.get_or_404(user_id)
+    target_user = db.get_or_404(User, user_id)
 
     if target_user.id == current_user.id:
         flash('Você não pode alterar seu próprio tipo de usuário.', 'error')
         return redirect(url_for('user.manage_users'))
 
+    # Nome lido antes do commit (depois dele o objeto expira e seria recarregado)
+    user_name = f'{target_user.first_name} {target_user.last_name}'
+
     if target_user.user_type == 'moderator':
         try:
             target_user.user_type = 'student'
             db.session.commit()
-            flash(f'{target_user.first_name} {target_user.last_name} rebaixado a aluno!', 'success')
+            flash(f'{user_name} rebaixado a aluno!', 'success')
         except Exception as e:
             db.session.rollback()
             flash('Erro ao rebaixar usuário.', 'error')
@@ -258,12 +266,14 @@ def toggle_approval(user_id):
     """Alternar aprovação do usuário"""
     db = current_app.extensions['sqlalchemy']
     
-    target_user = User.query.get_or_404(user_id)
+    target_user = db.get_or_404(User, user_id)
 
     if target_user.id == current_user.id:
         flash('Você não pode alterar sua própria aprovação.', 'error')
         return redirect(url_for('user.manage_users'))
 
+    user_name = f'{target_user.first_name} {target_user.last_name}'
+
     try:
         if target_user.is_approved:
             target_user.is_approved = False
@@ -273,7 +283,7 @@ def toggle_approval(user_id):
             action = 'aprovado'
 
         db.session.commit()
-        flash(f'{target_user.first_name} {target_user.last_name} {action} com sucesso!', 'success')
+        flash(f'{user_name} {action} com sucesso!', 'success')
 
     except Exception as e:
         db.session.rollback()
@@ -290,7 +300,7 @@ def delete_user(user_id):
     """Excluir usuário (apenas admin)"""
     db = current_app.extensions['sqlalchemy']
     
-    target_user = User.query.get_or_404(user_id)
+    target_user = db.get_or_404(User, user_id)
 
     if target_user.id == current_user.id:
         flash('Você não pode excluir sua própria conta.', 'error')
@@ -383,13 +393,9 @@ def export_users():
     writer.writerow(['ID', 'Username', 'Nome', 'Email', 'Tipo', 'Aprovado', 'Data Criação'])
 
     # Dados dos usuários
-    users = User.query.order_by(User.created_at.desc()).all()
+    users = User.list_query().order_by(User.created_at.desc()).all()
     for user_obj in users:
-        user_type_display = {
-            'admin': 'Administrador',
-            'moderator': 'Moderador', 
-            'student': 'Aluno'
-        }.get(user_obj.user_type, user_obj.user_type)
+        user_type_display = USER_TYPE_DISPLAY.get(user_obj.user_type, user_obj.user_type)
         
         writer.writerow([
             user_obj.id,
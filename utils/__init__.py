@@ -24,7 +24,12 @@ from .helpers import (
     generate_filename,
     validate_quiz_data,
     validate_question_data,
-    calculate_quiz_score
+    calculate_quiz_score,
+    hash_password,
+    verify_password,
+    verify_dummy_password,
+    password_needs_rehash,
+    batch_iter
 )
 
 # Lista de todas as funções disponíveis para import
@@ -45,7 +50,12 @@ __all__ = [
     'generate_filename',
     'validate_quiz_data',
     'validate_question_data',
-    'calculate_quiz_score'
+    'calculate_quiz_score',
+    'hash_password',
+    'verify_password',
+    'verify_dummy_password',
+    'password_needs_rehash',
+    'batch_iter'
 ]
 
 # Versão do módulo
@@ -11,7 +11,7 @@ Decoradores para controlar acesso às rotas baseado no tipo de usuário:
 """
 
 from functools import wraps
-from flask import redirect, url_for, flash, abort, request
+from flask import redirect, url_for, flash, abort, request, current_app
 from flask_login import current_user
 
 
@@ -160,7 +160,7 @@ def quiz_owner_or_admin_required(f):
 
         # Importar aqui para evitar import circular
         from models.quiz import Quiz
-        quiz = Quiz.query.get_or_404(quiz_id)
+        quiz = current_app.extensions['sqlalchemy'].get_or_404(Quiz, quiz_id)
 
         # Verificar se é o criador do quiz ou admin
         if not (current_user.is_admin or quiz.created_by == current_user.id):
@@ -12,8 +12,13 @@ Funções utilitárias para:
 import os
 import uuid
 import re
+from functools import lru_cache
+from itertools import islice
 from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from PIL import Image
 from flask import current_app, flash
 
@@ -21,6 +26,14 @@ from flask import current_app, flash
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_IMAGE_SIZE = (1920, 1080)  # Redimensionar imagens grandes
 
+# Padrões de validação compilados uma vez (\Z: fim real da string, sem aceitar '\n' no final)
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+USERNAME_RE = re.compile(r'[a-zA-Z0-9_]+\Z')
+PHONE_RE = re.compile(r'[\d\s\-\(\)\+]+\Z')
+
+# Hash de senhas com Argon2id (mais seguro e rápido por milissegundo que PBKDF2)
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+
 
 def allowed_file(filename):
     """
@@ -231,8 +244,82 @@ def validate_email(email):
     if not email:
         return False
 
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_RE.match(email) is not None
+
+
+def hash_password(password):
+    """
+    Gera hash seguro da senha usando Argon2id
+
+    Args:
+        password (str): Senha em texto puro
+
+    Returns:
+        str: Hash da senha
+    """
+    return _password_hasher.hash(password)
+
+
+def verify_password(password_hash, password):
+    """
+    Verifica senha contra o hash armazenado
+    Aceita hashes Argon2 e hashes antigos do Werkzeug (PBKDF2/scrypt)
+
+    Args:
+        password_hash (str): Hash armazenado
+        password (str): Senha fornecida
+
+    Returns:
+        bool: True se a senha confere, False caso contrário
+    """
+    if not password_hash or not password:
+        return False
+
+    if not password_hash.startswith('$argon2'):
+        return check_password_hash(password_hash, password)
+
+    try:
+        return _password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash():
+    """Hash Argon2 descartável, gerado uma vez por processo (ver verify_dummy_password)"""
+    return _password_hasher.hash(uuid.uuid4().hex)
+
+
+def verify_dummy_password(password):
+    """
+    Faz uma verificação Argon2 que sempre falha, com o mesmo custo de uma real.
+    Usada no login quando o usuário não existe, para o tempo de resposta não
+    revelar quais usernames/emails estão cadastrados
+
+    Args:
+        password (str): Senha fornecida
+
+    Returns:
+        bool: Sempre False
+    """
+    verify_password(_dummy_password_hash(), password or ' ')
+    return False
+
+
+def password_needs_rehash(password_hash):
+    """
+    Verifica se o hash deve ser refeito (formato antigo ou parâmetros desatualizados)
+
+    Args:
+        password_hash (str): Hash armazenado
+
+    Returns:
+        bool: True se deve gerar novo hash no próximo login
+    """
+    if not password_hash or not password_hash.startswith('$argon2'):
+        return True
+
+    return _password_hasher.check_needs_rehash(password_hash)
 
 
 def validate_password(password):
@@ -489,4 +576,22 @@ def generate_quiz_slug(title):
     slug = re.sub(r'-+', '-', slug)
     slug = slug.strip('-')
 
-    return slug or 'quiz'
\ No newline at end of file
+    return slug or 'quiz'
+
+
+def batch_iter(items, size=500):
+    """
+    Divide uma sequência em lotes de tamanho fixo
+
+    Útil para cláusulas IN grandes (limites de parâmetros do banco).
+
+    Args:
+        items (iterable): Itens a dividir (ex: lista de IDs)
+        size (int): Tamanho máximo de cada lote
+
+    Yields:
+        list: Próximo lote de itens
+    """
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch